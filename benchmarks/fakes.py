@@ -0,0 +1,432 @@
+"""
+Dobles locales de Serper, Gemini, Sheets, Gmail y el scraper para el benchmark
+Cada proveedor simula latencia, tasa de errores y cuota configurables; las
+respuestas son deterministas para que dos corridas sean comparables.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+from src.card_parser import parse_cards_html
+from src.metrics import metrics
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (0 si no hay datos)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _stable_int(text):
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+
+
+class ProviderSim:
+    """Latencia, errores y cuota de un proveedor simulado (thread-safe)"""
+
+    def __init__(self, name, latency=0.0, jitter=0.25, error_rate=0.0, quota=None, seed=0):
+        """
+        Args:
+            latency: Latencia media por llamada en segundos
+            jitter: Desvío relativo de la latencia
+            error_rate: Probabilidad de error transitorio (5xx) por llamada
+            quota: Llamadas permitidas antes de responder 429 (None = sin tope)
+        """
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota = quota
+        self.rng = random.Random(f"{name}:{seed}")
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies = []
+
+    def call(self, payload=None):
+        """
+        Simula una llamada: espera la latencia y decide el resultado.
+
+        Returns:
+            None si fue exitosa, 'quota' (429) o 'error' (503)
+        """
+        with self.lock:
+            self.calls += 1
+            number = self.calls
+            failed = self.rng.random() < self.error_rate
+            delay = max(0.0, self.rng.gauss(self.latency, self.latency * self.jitter))
+            if payload is not None:
+                self.bytes += len(json.dumps(payload, ensure_ascii=False, default=str).encode())
+
+        time.sleep(delay)
+
+        with self.lock:
+            self.latencies.append(delay)
+            if self.quota is not None and number > self.quota:
+                self.errors += 1
+                return "quota"
+            if failed:
+                self.errors += 1
+                return "error"
+        return None
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes_sent": self.bytes,
+            "latency_p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "latency_p95_ms": round(percentile(self.latencies, 95) * 1000, 2),
+        }
+
+
+# --- Serper ---
+
+class FakeResponse:
+
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+
+class FakeSerperSession:
+    """Reemplazo de requests/Session para google.serper.dev"""
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        outcome = self.sim.call(json)
+        if outcome == "quota":
+            return FakeResponse(429, headers={"Retry-After": "1"})
+        if outcome == "error":
+            return FakeResponse(503)
+        if isinstance(json, list):
+            return FakeResponse(200, [self._search(q) for q in json])
+        return FakeResponse(200, self._search(json))
+
+    @staticmethod
+    def _search(payload):
+        query = payload.get("q", "")
+        seed = _stable_int(query)
+        organic = [
+            {
+                "title": f"{query.split(' ')[0].title()} resultado {i + 1}",
+                "snippet": f"Datos comerciales y volumen de importación ({seed % 97 + i} M USD).",
+                "link": f"https://example.com/{seed % 1000}/{i}",
+            }
+            for i in range(payload.get("num", 5))
+        ]
+        data = {"organic": organic}
+        if seed % 3 == 0:
+            data["knowledgeGraph"] = {
+                "title": query.split(" importador")[0],
+                "description": "Empresa mexicana con operaciones de comercio exterior.",
+                "website": f"https://empresa-{seed % 1000}.mx",
+            }
+        return data
+
+
+# --- Gemini ---
+
+class _GeminiResponse:
+
+    def __init__(self, text):
+        self.text = text
+
+
+class _GeminiAPIError(RuntimeError):
+    """Como google.genai.errors.APIError: el código HTTP queda en .code"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class _GeminiModels:
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def generate_content(self, model, contents, config=None):
+        outcome = self.sim.call({"prompt": contents})
+        if outcome == "quota":
+            raise _GeminiAPIError(429, "429 RESOURCE_EXHAUSTED (simulado)")
+        if outcome == "error":
+            raise _GeminiAPIError(503, "503 UNAVAILABLE (simulado)")
+
+        if "CRITERIOS DEL ICP" in contents:
+            return _GeminiResponse(json.dumps(self._evaluate(contents)))
+
+        batch = re.findall(
+            r"PERFIL (\d+):\n(.*?)(?=\n\nPERFIL \d+:|\n\nFormato de respuesta)", contents, re.S
+        )
+        if batch:
+            return _GeminiResponse(json.dumps([
+                dict(index=int(i), **self._profile(text)) for i, text in batch
+            ]))
+
+        single = re.search(r"PERFIL:\n(.*?)\n\nFormato de respuesta", contents, re.S)
+        return _GeminiResponse(json.dumps(self._profile(single.group(1) if single else "")))
+
+    @staticmethod
+    def _profile(text):
+        """Interpreta el layout de las tarjetas de fixtures: nombre, ..., 'cargo · empresa'"""
+        lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+        profile = {"name": lines[0] if lines else None, "role": None, "company": None}
+        for line in lines[1:]:
+            if " · " in line and not line.startswith("·"):
+                profile["role"], profile["company"] = [part.strip() for part in line.split(" · ", 1)]
+                break
+        return profile
+
+    @staticmethod
+    def _evaluate(contents):
+        profile = contents.split("INFORMACIÓN DEL PROSPECTO:", 1)[-1]
+        score = _stable_int(profile) % 101
+        return {"fit": score >= 60, "score": score, "reason": f"Evaluación simulada ({score})"}
+
+
+class FakeGeminiClient:
+    """Reemplazo de genai.Client: solo expone models.generate_content"""
+
+    def __init__(self, sim):
+        self.models = _GeminiModels(sim)
+
+
+# --- Google Sheets ---
+
+class _FakeHttpResponse(dict):
+
+    def __init__(self, status, reason):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = reason
+
+
+def _http_error(outcome):
+    status, reason = (429, "Quota exceeded") if outcome == "quota" else (503, "Backend Error")
+    return HttpError(_FakeHttpResponse(status, reason), json.dumps({"error": {"message": reason}}).encode())
+
+
+def _col_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def _col_letters(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def parse_a1(range_name):
+    """
+    'Leads!A2:L' -> ('Leads', 0, 2, 11, None)
+
+    Returns:
+        (tab, col_inicio, fila_inicio, col_fin, fila_fin); None = abierto
+    """
+    tab, _, cells = range_name.partition("!")
+    tab = tab.strip("'")
+    start, _, end = cells.partition(":")
+    m1 = re.fullmatch(r"([A-Z]*)(\d*)", start)
+    m2 = re.fullmatch(r"([A-Z]*)(\d*)", end) if end else m1
+    c1 = _col_index(m1.group(1)) if m1.group(1) else 0
+    r1 = int(m1.group(2)) if m1.group(2) else 1
+    c2 = _col_index(m2.group(1)) if m2.group(1) else None
+    r2 = int(m2.group(2)) if m2.group(2) else None
+    return tab, c1, r1, c2, r2
+
+
+class _Request:
+
+    def __init__(self, sim, payload, action):
+        self.sim = sim
+        self.payload = payload
+        self.action = action
+
+    def execute(self):
+        outcome = self.sim.call(self.payload)
+        if outcome:
+            raise _http_error(outcome)
+        return self.action()
+
+
+class FakeSheetsService:
+    """Sheets API v4 en memoria (solo lo que usa SheetsInterface)"""
+
+    def __init__(self, sim, tabs):
+        """
+        Args:
+            tabs: Dict {nombre_tab: lista de filas} con el contenido inicial
+        """
+        self.sim = sim
+        self.tabs = {name: [list(row) for row in rows] for name, rows in tabs.items()}
+        self.lock = threading.Lock()
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    # --- Operaciones sobre la grilla ---
+
+    def _read(self, range_name):
+        tab, c1, r1, c2, r2 = parse_a1(range_name)
+        rows = self.tabs.get(tab, [])
+        r2 = len(rows) if r2 is None else min(r2, len(rows))
+        values = []
+        for row in rows[r1 - 1:r2]:
+            cells = row[c1:(c2 + 1 if c2 is not None else None)]
+            while cells and cells[-1] in ("", None):
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _write(self, tab, c1, r1, values):
+        rows = self.tabs.setdefault(tab, [])
+        for offset, row_values in enumerate(values):
+            index = r1 - 1 + offset
+            while len(rows) <= index:
+                rows.append([])
+            row = rows[index]
+            while len(row) < c1 + len(row_values):
+                row.append("")
+            row[c1:c1 + len(row_values)] = row_values
+
+    # --- API ---
+
+    def get(self, spreadsheetId, range=None):
+        if range is None:
+            return _Request(self.sim, None, lambda: {
+                "sheets": [{"properties": {"title": name}} for name in self.tabs]
+            })
+
+        def action():
+            with self.lock:
+                return {"range": range, "values": self._read(range)}
+        return _Request(self.sim, {"range": range}, action)
+
+    def batchGet(self, spreadsheetId, ranges):
+        def action():
+            with self.lock:
+                return {"valueRanges": [{"range": r, "values": self._read(r)} for r in ranges]}
+        return _Request(self.sim, {"ranges": ranges}, action)
+
+    def append(self, spreadsheetId, range, valueInputOption=None, insertDataOption=None, body=None):
+        def action():
+            with self.lock:
+                tab, c1, r1, _, _ = parse_a1(range)
+                rows = self.tabs.setdefault(tab, [])
+                last = max([i + 1 for i, row in enumerate(rows) if any(row)] or [r1 - 1])
+                start = max(last + 1, r1)
+                values = body["values"]
+                self._write(tab, c1, start, values)
+                width = max(len(v) for v in values)
+                end = start + len(values) - 1
+                updated = f"{tab}!{_col_letters(c1)}{start}:{_col_letters(c1 + width - 1)}{end}"
+                return {"updates": {"updatedRange": updated, "updatedRows": len(values)}}
+        return _Request(self.sim, body, action)
+
+    def update(self, spreadsheetId, range, valueInputOption=None, body=None):
+        def action():
+            with self.lock:
+                tab, c1, r1, _, _ = parse_a1(range)
+                self._write(tab, c1, r1, body["values"])
+                return {"updatedRange": range}
+        return _Request(self.sim, body, action)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def action():
+            with self.lock:
+                responses = []
+                for item in body["data"]:
+                    tab, c1, r1, _, _ = parse_a1(item["range"])
+                    self._write(tab, c1, r1, item["values"])
+                    responses.append({"updatedRange": item["range"]})
+                return {"responses": responses}
+        return _Request(self.sim, body, action)
+
+    def clear(self, spreadsheetId, range):
+        range_name = range
+
+        def action():
+            with self.lock:
+                tab, c1, r1, c2, r2 = parse_a1(range_name)
+                for row in self.tabs.get(tab, [])[r1 - 1:r2]:
+                    end = len(row) if c2 is None else min(len(row), c2 + 1)
+                    row[c1:end] = [""] * max(0, end - c1)
+                return {"clearedRange": range_name}
+        return _Request(self.sim, {"range": range_name}, action)
+
+
+# --- Gmail ---
+
+class FakeGmailService:
+    """Gmail API: users().messages().send() solo registra el envío"""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.sent = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        def action():
+            self.sent.append(body)
+            return {"id": f"fake-{len(self.sent)}"}
+        return _Request(self.sim, body, action)
+
+
+# --- Scraper ---
+
+class FixtureScraper:
+    """Reproduce páginas de Sales Navigator guardadas como HTML, sin navegador"""
+
+    def __init__(self, pages_html, sim):
+        """
+        Args:
+            pages_html: Lista con el HTML de cada página, en orden
+            sim: ProviderSim que simula el tiempo de carga por página
+        """
+        self.pages_html = pages_html
+        self.sim = sim
+
+    def iter_pages(self, search_url, max_pages=3):
+        for page_num in range(min(max_pages, len(self.pages_html))):
+            self.sim.call()
+            # Mismo nombre de operación que el scraper real
+            with metrics.track("linkedin", "extract_cards"):
+                cards = parse_cards_html(self.pages_html[page_num])
+            yield cards
+
+    def get_profiles(self, search_url, max_pages=3):
+        return [card for page in self.iter_pages(search_url, max_pages) for card in page]
@@ -0,0 +1,282 @@
+"""
+Benchmark offline del pipeline completo de Meridian-BDR
+
+Corre scrape_and_save, research_and_evaluate y send_notification contra
+dobles locales de Serper, Gemini, Sheets y Gmail, reproduciendo páginas
+de Sales Navigator guardadas en benchmarks/fixtures/. Escribe un JSON con
+leads/minuto, latencias p50/p95 por etapa, llamadas por lead y RSS pico.
+
+Uso:
+    python -m benchmarks.harness --runs 3 --workers 4
+    python -m benchmarks.harness --latency gemini=0.8 --error-rate serper=0.05 --quota serper=100
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Sin topes reales de rate limit salvo que se pidan: medimos el pipeline, no la espera
+for _provider in ("SERPER", "GEMINI", "SHEETS"):
+    os.environ.setdefault(f"{_provider}_RATE_PER_MIN", "6000000")
+    os.environ.setdefault(f"{_provider}_BURST", "100000")
+# El uso de cuota de las corridas simuladas no se mezcla con el real
+os.environ.setdefault("QUOTA_DB_PATH", ":memory:")
+os.environ.setdefault("SERPER_API_KEY", "benchmark")
+os.environ.setdefault("BDR_EMAIL", "bdr@example.com")
+
+import main
+from src.brain import MeridianBrain
+from src.metrics import metrics
+from src.notifier import EmailNotifier
+from src.researcher_api import CompanyResearcherAPI
+from src.sheets import SheetsInterface
+
+from benchmarks.fakes import (
+    FakeGeminiClient, FakeGmailService, FakeSerperSession, FakeSheetsService,
+    FixtureScraper, ProviderSim, percentile,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+PROVIDERS = ("serper", "gemini", "sheets", "gmail", "scraper")
+
+# Latencias medias por defecto (segundos), del orden de las observadas en producción
+DEFAULT_LATENCY = {
+    "serper": 0.35,
+    "gemini": 0.9,
+    "sheets": 0.25,
+    "gmail": 0.4,
+    "scraper": 0.0,
+}
+
+LEADS_HEADER = [
+    "ID", "Fecha", "Nombre", "Cargo", "Empresa", "Fuente", "Score", "Fit",
+    "Razón", "Info Importaciones", "LinkedIn", "Status", "Notas BDR",
+]
+
+
+def _provider_options(values, cast):
+    """Convierte ['gemini=0.8', ...] en {'gemini': 0.8}"""
+    options = {}
+    for value in values or []:
+        provider, _, amount = value.partition("=")
+        if provider not in PROVIDERS:
+            raise SystemExit(f"Proveedor desconocido: {provider} (usa {', '.join(PROVIDERS)})")
+        options[provider] = cast(amount)
+    return options
+
+
+def _initial_tabs(pages, max_leads):
+    return {
+        "Config": [
+            ["Parámetro", "Valor"],
+            ["ICP", "Empresas importadoras de México, volumen mínimo $1M USD"],
+            ["Research Queries", "{company} importador México, {company} importaciones volumen USD"],
+            ["Sales Nav URL", "https://www.linkedin.com/sales/search/people?fixture=1"],
+            ["Max Pages", str(pages)],
+            ["Max Leads/Day", str(max_leads)],
+            ["Auto Run", "No"],
+            ["Last Run", ""],
+        ],
+        "Leads": [LEADS_HEADER],
+    }
+
+
+def _git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_once(args, pages_html, run_index):
+    """
+    Una corrida completa del pipeline contra los dobles.
+
+    Returns:
+        Dict con tiempos por etapa, leads y resumen por proveedor
+    """
+    sims = {
+        name: ProviderSim(
+            name,
+            latency=args.latency.get(name, DEFAULT_LATENCY[name]),
+            error_rate=args.error_rate.get(name, 0.0),
+            quota=args.quota.get(name),
+            seed=args.seed + run_index,
+        )
+        for name in PROVIDERS
+    }
+    sheets_service = FakeSheetsService(sims["sheets"], _initial_tabs(len(pages_html), args.max_leads))
+
+    # Estado limpio por corrida: singletons del proceso y cachés en disco
+    main._sheets = SheetsInterface("benchmark", service=sheets_service)
+    main._config = None
+    main._lead_index = None
+    main._journal = None
+    main._researcher = None
+    main._notifier = None
+    main.MeridianScraper = lambda *a, **k: FixtureScraper(pages_html, sims["scraper"])
+    main.MeridianBrain = lambda *a, **k: MeridianBrain(client=FakeGeminiClient(sims["gemini"]))
+    main.CompanyResearcherAPI = lambda *a, **k: CompanyResearcherAPI(session=FakeSerperSession(sims["serper"]))
+    main.EmailNotifier = lambda *a, **k: EmailNotifier(service=FakeGmailService(sims["gmail"]))
+
+    metrics.reset()
+    stages = {}
+    output = io.StringIO() if not args.verbose else sys.stdout
+    with contextlib.redirect_stdout(output):
+        if args.stream:
+            started = time.perf_counter()
+            qualified, processed, discarded = main.run_pipeline(args.workers)
+            stages["pipeline"] = time.perf_counter() - started
+            saved = sum(1 for row in sheets_service.tabs["Leads"][1:] if row and row[0])
+        else:
+            started = time.perf_counter()
+            saved = main.scrape_and_save() or 0
+            stages["scrape"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            qualified, processed, discarded = main.research_and_evaluate(args.workers, serper_batch=args.serper_batch)
+            stages["research"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if processed > 0:
+            main.send_notification(qualified, processed, discarded)
+        stages["notify"] = time.perf_counter() - started
+
+    return {
+        "stages": stages,
+        "total_seconds": sum(stages.values()),
+        "leads_saved": saved,
+        "leads_processed": processed,
+        "leads_qualified": len(qualified),
+        "providers": {name: sim.summary() for name, sim in sims.items()},
+        "instrumentation": metrics.snapshot(),
+    }
+
+
+def summarize(runs):
+    """Agrega las corridas: percentiles por etapa y llamadas por lead"""
+    stage_names = sorted({name for run in runs for name in run["stages"]})
+    total_seconds = sum(run["total_seconds"] for run in runs)
+    total_saved = sum(run["leads_saved"] for run in runs)
+    total_processed = sum(run["leads_processed"] for run in runs)
+
+    providers = {}
+    for name in PROVIDERS:
+        calls = sum(run["providers"][name]["calls"] for run in runs)
+        providers[name] = {
+            "calls": calls,
+            "errors": sum(run["providers"][name]["errors"] for run in runs),
+            "calls_per_lead": round(calls / total_saved, 3) if total_saved else None,
+            "latency_p50_ms": percentile([run["providers"][name]["latency_p50_ms"] for run in runs], 50),
+            "latency_p95_ms": max(run["providers"][name]["latency_p95_ms"] for run in runs),
+        }
+
+    return {
+        "leads_per_minute": round(total_saved / (total_seconds / 60), 2) if total_seconds else 0,
+        "processed_per_minute": round(total_processed / (total_seconds / 60), 2) if total_seconds else 0,
+        "stages": {
+            name: {
+                "p50_s": round(percentile([r["stages"][name] for r in runs if name in r["stages"]], 50), 3),
+                "p95_s": round(percentile([r["stages"][name] for r in runs if name in r["stages"]], 95), 3),
+            }
+            for name in stage_names
+        },
+        "api_calls_per_lead": round(
+            sum(p["calls"] for n, p in providers.items() if n != "scraper") / total_saved, 3
+        ) if total_saved else None,
+        "providers": providers,
+        # ru_maxrss viene en KB en Linux y en bytes en macOS
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+        ),
+    }
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline de Meridian-BDR")
+    parser.add_argument("--runs", type=int, default=3, help="Corridas completas a medir")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de la etapa de investigación")
+    parser.add_argument("--stream", action="store_true", help="Medir el modo pipeline (full --stream)")
+    parser.add_argument("--serper-batch", action="store_true", help="Investigar con requests de lote a Serper")
+    parser.add_argument("--max-leads", type=int, default=200, help="Max Leads/Day del Config simulado")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Carpeta con páginas HTML guardadas")
+    parser.add_argument("--latency", action="append", metavar="PROV=SEG", help="Latencia media por proveedor")
+    parser.add_argument("--error-rate", action="append", metavar="PROV=TASA", help="Tasa de errores 5xx")
+    parser.add_argument("--quota", action="append", metavar="PROV=N", help="Llamadas antes de responder 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Archivo JSON de resultados (default benchmarks/results/)")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida del pipeline")
+    args = parser.parse_args(argv)
+
+    args.latency = _provider_options(args.latency, float)
+    args.error_rate = _provider_options(args.error_rate, float)
+    args.quota = _provider_options(args.quota, int)
+
+    fixture_files = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not fixture_files:
+        raise SystemExit(f"❌ No hay fixtures HTML en {args.fixtures}")
+    pages_html = []
+    for path in fixture_files:
+        with open(path, encoding="utf-8") as f:
+            pages_html.append(f.read())
+
+    output_path = os.path.abspath(args.output) if args.output else os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+
+    runs = []
+    cwd = os.getcwd()
+    try:
+        for run_index in range(args.runs):
+            # Cada corrida en un directorio propio: cachés e índice de leads en frío
+            with tempfile.TemporaryDirectory(prefix="meridian-bench-") as workdir:
+                os.chdir(workdir)
+                run = run_once(args, pages_html, run_index)
+                os.chdir(cwd)
+            runs.append(run)
+            print(f"   Corrida {run_index + 1}/{args.runs}: {run['leads_saved']} leads en {run['total_seconds']:.2f}s")
+    finally:
+        os.chdir(cwd)
+
+    report = {
+        "version": _git_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "runs": args.runs, "workers": args.workers, "stream": args.stream, "serper_batch": args.serper_batch,
+            "pages": len(pages_html), "max_leads": args.max_leads,
+            "latency": {**DEFAULT_LATENCY, **args.latency},
+            "error_rate": args.error_rate, "quota": args.quota, "seed": args.seed,
+        },
+        "summary": summarize(runs),
+        "runs": runs,
+    }
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    summary = report["summary"]
+    print(f"\n📈 {summary['leads_per_minute']} leads/min | {summary['api_calls_per_lead']} llamadas API/lead | RSS pico {summary['peak_rss_mb']} MB")
+    for name, stage in summary["stages"].items():
+        print(f"   {name:<10} p50 {stage['p50_s']:.3f}s  p95 {stage['p95_s']:.3f}s")
+    print(f"💾 Resultados: {output_path}")
+    return report
+
+
+if __name__ == "__main__":
+    main_cli()
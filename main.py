@@ -5,181 +5,917 @@ Agente de prospección automatizado con menú de comandos completo.
 """
 
 import os
+import re
 import sys
+import signal
+import importlib
 import time
+import queue
 import hashlib
+import threading
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 
-from src.sheets import SheetsInterface
-from src.scraper import MeridianScraper
-from src.researcher_api import CompanyResearcherAPI
-from src.brain import MeridianBrain
-from src.notifier import EmailNotifier
+from src.snapshots import ReplayScraper, new_snapshot_path, replay
+from src.normalize import normalize_company
+from src.profile_parser import PARSER_MIN_CONFIDENCE, parse_profile
+from src.lead_index import LeadIndex
+from src.journal import RunJournal, card_key
+from src.metrics import metrics
+from src.ratelimit import QuotaExhausted, quota_report
 
 load_dotenv()
 
+def _lazy(module, name):
+    """
+    Clase de un módulo pesado (Playwright, google-genai, googleapiclient) que
+    se importa recién al instanciarla: los subcomandos livianos no la cargan.
+    """
+    def factory(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+    factory.__name__ = name
+    return factory
+
+SheetsInterface = _lazy("src.sheets", "SheetsInterface")
+MeridianScraper = _lazy("src.scraper", "MeridianScraper")
+CompanyResearcherAPI = _lazy("src.researcher_api", "CompanyResearcherAPI")
+MeridianBrain = _lazy("src.brain", "MeridianBrain")
+EmailNotifier = _lazy("src.notifier", "EmailNotifier")
+
+# Modo streaming: páginas en cola entre scraper y extracción, y leads en vuelo por worker
+PIPELINE_QUEUE_PAGES = 2
+PIPELINE_LEADS_PER_WORKER = 2
+
 def generate_lead_id(name, company):
     raw_string = f"{name.lower().strip()}|{company.lower().strip()}"
     return hashlib.md5(raw_string.encode()).hexdigest()[:12]
 
-def get_config(sheets):
-    config = {}
+# Parámetros del tab Config: clave -> (etiqueta en columna A, fila por defecto)
+CONFIG_FIELDS = {
+    'icp': ("ICP", 2),
+    'research_queries': ("Research Queries", 3),
+    'sales_nav_url': ("Sales Nav URL", 4),
+    'max_pages': ("Max Pages", 5),
+    'max_leads_day': ("Max Leads/Day", 6),
+    'auto_run': ("Auto Run", 7),
+    'poll_minutes': ("Poll Minutes", 9),
+    'scrape_time': ("Scrape Time", 10),
+}
+
+# Valores de "Auto Run" que activan el daemon
+AUTO_RUN_VALUES = {"si", "sí", "yes", "true", "1", "x", "✅"}
+
+_sheets = None
+_config = None
+_lead_index = None
+_journal = None
+_researcher = None
+_notifier = None
+_journal_lock = threading.Lock()
+
+def split_search_urls(value):
+    """
+    Una o varias URLs de Sales Navigator (una por línea o separadas por
+    espacios/comas), sin repetir. Las URLs de Sales Nav llevan comas
+    propias, así que solo se corta en la coma que precede a otra URL.
+    """
+    parts = re.split(r"\s+|,(?=\s*https?://)", value or "")
+    return list(dict.fromkeys(part for part in parts if part.startswith("http")))
+
+# Formatos aceptados para "Scrape Time" (Sheets puede mostrar la celda como hora)
+SCRAPE_TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M:%S %p")
+
+def parse_scrape_time(value):
+    """
+    Hora del scrape diario del daemon ('7:00', '07:00:00', '7:00 AM').
+    
+    Returns:
+        datetime.time, o None si está vacía o no se reconoce (con aviso)
+    """
+    value = str(value or "").strip()
+    if not value:
+        return None
+    for fmt in SCRAPE_TIME_FORMATS:
+        try:
+            return datetime.strptime(value.upper(), fmt).time()
+        except ValueError:
+            continue
+    print(f"⚠️ Scrape Time no reconocido: '{value}' (usa HH:MM); el daemon no scrapeará")
+    return None
+
+def get_sheets():
+    """SheetsInterface compartido por todas las etapas (se autentica una vez)"""
+    global _sheets
+    if _sheets is None:
+        _sheets = SheetsInterface(os.getenv("GOOGLE_SHEET_ID"))
+    return _sheets
+
+def get_lead_index(sheets):
+    """Índice local de Leads sincronizado con el delta del Sheet"""
+    global _lead_index
+    if _lead_index is None:
+        _lead_index = LeadIndex(sheets.spreadsheet_id)
+    new_rows = _lead_index.sync(sheets)
+    if new_rows: print(f"🗂️ Índice de leads: {new_rows} filas nuevas sincronizadas")
+    return _lead_index
+
+def get_researcher():
+    """CompanyResearcherAPI compartido: el pool de conexiones a Serper sigue vivo entre etapas"""
+    global _researcher
+    if _researcher is None:
+        _researcher = CompanyResearcherAPI()
+    return _researcher
+
+def get_notifier():
+    """EmailNotifier compartido (OAuth y build() de Gmail una sola vez)"""
+    global _notifier
+    if _notifier is None:
+        _notifier = EmailNotifier()
+    return _notifier
+
+def get_journal():
+    """Journal de la corrida en curso (retoma la anterior si quedó a medias)"""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = RunJournal()
+        if _journal.run_id is None:
+            _journal.begin()
+        return _journal
+
+def finish_run():
+    """
+    Cierra la corrida: el journal se compacta siempre y las tarjetas sin
+    guardar (sobre el cupo diario, scrape caído, falla del modelo) quedan
+    diferidas para el próximo scrape.
+    """
+    get_journal().complete()
+
+def get_config(sheets, refresh=False):
+    """
+    Lee el tab Config con una sola llamada y lo cachea por el resto del proceso.
+    
+    Cada parámetro se busca por su etiqueta en la columna A; si la etiqueta
+    no aparece se usa su fila histórica (B2..B10).
+    """
+    global _config
+    if _config is not None and not refresh:
+        return _config
+    
     try:
-        icp = sheets.read_range("Config!B2")
-        config['icp'] = icp[0][0] if icp and icp[0] else ""
-        queries = sheets.read_range("Config!B3")
-        config['research_queries'] = queries[0][0] if queries and queries[0] else "{company} importador México"
-        url = sheets.read_range("Config!B4")
-        config['sales_nav_url'] = url[0][0] if url and url[0] else os.getenv("SALES_NAV_LIST_URL")
-        max_pages = sheets.read_range("Config!B5")
-        config['max_pages'] = int(max_pages[0][0]) if max_pages and max_pages[0] else 3
-        max_leads = sheets.read_range("Config!B6")
-        config['max_leads_day'] = int(max_leads[0][0]) if max_leads and max_leads[0] else 50
-    except:
-        config = {'icp': "", 'research_queries': "", 'sales_nav_url': os.getenv("SALES_NAV_LIST_URL"), 'max_pages': 3, 'max_leads_day': 50}
+        rows = sheets.read_range("Config!A:B")
+        if rows is None: raise ValueError("Config no disponible")
+        by_label = {r[0].strip().lower(): r[1] for r in rows if len(r) > 1 and r[0]}
+        by_row = {n: r[1] for n, r in enumerate(rows, start=1) if len(r) > 1}
+        
+        raw = {}
+        for key, (label, row_num) in CONFIG_FIELDS.items():
+            value = by_label.get(label.lower(), by_row.get(row_num, ""))
+            raw[key] = value.strip() if isinstance(value, str) else value
+        
+        config = {
+            'icp': raw['icp'] or "",
+            'research_queries': raw['research_queries'] or "{company} importador México",
+            'sales_nav_urls': split_search_urls(raw['sales_nav_url'] or os.getenv("SALES_NAV_LIST_URL")),
+            'max_pages': int(raw['max_pages']) if raw['max_pages'] else 3,
+            'max_leads_day': int(raw['max_leads_day']) if raw['max_leads_day'] else 50,
+            'auto_run': str(raw['auto_run'] or "").lower() in AUTO_RUN_VALUES,
+            'poll_minutes': float(raw['poll_minutes']) if raw['poll_minutes'] else 10,
+            'scrape_time': parse_scrape_time(raw['scrape_time']),   # None = el daemon no scrapea
+        }
+    except Exception:
+        config = {'icp': "", 'research_queries': "", 'sales_nav_urls': split_search_urls(os.getenv("SALES_NAV_LIST_URL")), 'max_pages': 3, 'max_leads_day': 50,
+                  'auto_run': False, 'poll_minutes': 10, 'scrape_time': None}
+    
+    _config = config
     return config
 
+def get_option(name, default=None):
+    """Lee una opción de línea de comandos en formato '--name valor' o '--name=valor'"""
+    for i, arg in enumerate(sys.argv):
+        if arg == name and i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+    return default
+
+def get_scraper():
+    """
+    Navegador real o, con --replay ARCHIVO, las páginas guardadas en un
+    snapshot. Con --snapshot (o SCRAPER_SNAPSHOT=1) se guarda cada página visitada.
+    """
+    replay_path = get_option("--replay")
+    if replay_path:
+        return ReplayScraper(replay_path)
+    snapshot = "--snapshot" in sys.argv or os.getenv("SCRAPER_SNAPSHOT") == "1"
+    return MeridianScraper(snapshot_path=new_snapshot_path() if snapshot else None)
+
+def run_replay(path, repeat=1, workers=None):
+    """Re-extrae un archivo de snapshots sin navegador y compara con lo capturado en vivo"""
+    print(f"\n=== REPLAY: {path} ===")
+    result = replay(path, repeat, workers)
+    print(f"📦 {result['pages']} páginas ({result['cards']} tarjetas por vuelta) en {result['seconds']:.3f}s "
+          f"({result['pages_per_second']} páginas/seg)")
+    if result['mismatched_pages']:
+        print(f"⚠️ Páginas con tarjetas distintas a las capturadas: {result['mismatched_pages']}")
+    else:
+        print("✅ Extracción idéntica a la capturada en vivo")
+    return result
+
 def update_last_run(sheets):
     sheets.update_cell("Config!B8", datetime.now().strftime("%Y-%m-%d %H:%M"))
 
-def scrape_and_save():
-    print("\n=== PASO 1: EXTRACCIÓN ===")
-    sheet_id = os.getenv("GOOGLE_SHEET_ID")
-    sheets = SheetsInterface(sheet_id)
-    config = get_config(sheets)
+def write_run_report():
+    """
+    Reporte JSON de la corrida en data/runs/ (y textfile de Prometheus si
+    METRICS_PROM_FILE está definido). Se escribe al terminar cada comando.
+    """
+    try:
+        path = metrics.write_report()
+        prom_file = os.getenv("METRICS_PROM_FILE")
+        if prom_file: metrics.write_prometheus(prom_file)
+        print(f"📊 Reporte de corrida: {path}")
+    except OSError as e:
+        print(f"⚠️ No se pudo escribir el reporte: {e}")
+
+def _extract_profiles(brain, items):
+    """
+    Nombre/cargo/empresa de cada tarjeta: local si el markup es confiable,
+    y solo las tarjetas dudosas van al modelo (en batch).
     
-    search_url = config['sales_nav_url']
-    if not search_url: return print("❌ Error: Falta URL Sales Nav")
+    Returns:
+        Lista alineada con items: Dict con name, role, company o None
+    """
+    journal = get_journal()
+    keys = [card_key(item) for item in items]
+    analyses = [journal.get('extract', key) for key in keys]
     
-    scraper = MeridianScraper()
-    brain = MeridianBrain()
+    local, to_model = [], []
+    for i, item in enumerate(items):
+        if analyses[i] is not None: continue
+        fields, confidence = parse_profile(item)
+        if confidence >= PARSER_MIN_CONFIDENCE:
+            analyses[i] = fields
+            local.append(i)
+        else:
+            to_model.append(i)
     
-    existing_data = sheets.read_range("Leads!A2:A") 
-    existing_ids = set(row[0] for row in existing_data if row)
+    if to_model:
+        extracted = brain.extract_profiles_batch([items[i]['text'] for i in to_model])
+        for i, analysis in zip(to_model, extracted):
+            analyses[i] = analysis
     
-    print(f"📊 Leads existentes: {len(existing_ids)}")
+    # Sin nombre no se registra: al retomar, la tarjeta vuelve a extraerse
+    journal.record_many('extract', [
+        (keys[i], analyses[i]) for i in local + to_model if analyses[i] and analyses[i].get('name')
+    ])
+    metrics.incr("profiles_parsed_locally", len(local))
+    metrics.incr("profiles_sent_to_model", len(to_model))
+    return analyses
+
+def _extraction_line():
+    """Tasa de tarjetas que no pasaron por el modelo en esta corrida"""
+    local = metrics.counters.get("profiles_parsed_locally", 0)
+    total = local + metrics.counters.get("profiles_sent_to_model", 0)
+    rate = local / total * 100 if total else 0
+    skipped = metrics.counters.get("profiles_skipped_seen", 0)
+    return (f"   🧩 Extracción local: {local}/{total} tarjetas sin modelo ({rate:.0f}%)"
+            f" | {skipped} ya vistas, descartadas antes de extraer")
+
+def _build_new_rows(brain, items, existing_ids, limit, lead_index=None):
+    """
+    Extrae (en batch) y deduplica un grupo de tarjetas scrapeadas.
     
-    raw_profiles_data = scraper.get_profiles(search_url, max_pages=config['max_pages'])
-    print(f"\n📦 Perfiles encontrados: {len(raw_profiles_data)}")
+    Las tarjetas cuya URL de perfil (o texto) ya está en el índice se
+    descartan antes de extraer: no cuestan llamadas al modelo.
     
-    saved = 0
-    for item in raw_profiles_data:
-        if saved >= config['max_leads_day']: break
-        time.sleep(2)
-        
+    Args:
+        items: Lista de {'text', 'url', 'fields'} del scraper
+        existing_ids: Set de lead_ids ya guardados (se actualiza)
+        limit: Máximo de leads nuevos a devolver
+        lead_index: LeadIndex con el set de tarjetas ya vistas
+    
+    Returns:
+        Tuple: (lista de (fila_para_Leads, item) solo con leads nuevos,
+                claves de journal de las tarjetas resueltas: nuevas o duplicadas,
+                tarjetas identificadas para agregar al set de vistas)
+    """
+    new, handled, resolved = [], [], []
+    if lead_index is not None:
+        items, skipped = lead_index.split_seen(items)
+        handled.extend(card_key(item) for item in skipped)
+        metrics.incr("profiles_skipped_seen", len(skipped))
+        if skipped: print(f"   ⏭️ {len(skipped)} tarjetas ya vistas (sin llamar al modelo)")
+        if not items: return new, handled, resolved
+    analyses = _extract_profiles(brain, items)
+    
+    for item, analysis in zip(items, analyses):
+        if len(new) >= limit: break
         try:
-            analysis = brain.extract_profile_info(item['text'])
             if analysis and analysis.get('name'):
-                name = analysis.get('name', '').strip()
-                company = analysis.get('company', '')
+                name = (analysis.get('name') or '').strip()
+                company = analysis.get('company') or ''
                 lead_id = generate_lead_id(name, company)
                 
                 if lead_id in existing_ids:
                     print(f"   ⚠️ Duplicado: {name}")
+                    handled.append(card_key(item))
+                    resolved.append(item)
                     continue
                 
                 print(f"   💾 Nuevo: {name}")
                 row = [
-                    lead_id, datetime.now().strftime("%Y-%m-%d"), name, analysis.get('role', ''), company,
+                    lead_id, datetime.now().strftime("%Y-%m-%d"), name, analysis.get('role') or '', company,
                     "Sales Navigator", "", "", "", "", item['url'], "🔄 Pendiente", ""
                 ]
-                sheets.append_row("Leads!A2", row)
-                saved += 1
+                new.append((row, item))
+                handled.append(card_key(item))
+                resolved.append(item)
                 existing_ids.add(lead_id)
-        except: continue
+            else:
+                # Sin nombre puede ser una falla puntual del modelo (error, cuota):
+                # queda sin marcar como guardada y se reintenta en la próxima corrida
+                print(f"   ⚠️ Sin nombre, se reintenta después: {item.get('url') or item.get('text', '')[:40]}")
+        except Exception as e:
+            # Queda en el journal sin marcar como guardada: se reintenta al retomar
+            print(f"   ⚠️ Tarjeta omitida ({e}): {item.get('url') or item.get('text', '')[:40]}")
+    
+    return new, handled, resolved
+
+def _mark_saved(journal, lead_index, handled, resolved):
+    """Tarjetas ya reflejadas en el Sheet: cerradas en el journal y agregadas al set de vistas"""
+    journal.record_many('saved', [(key, None) for key in handled])
+    lead_index.mark_seen(resolved)
+
+@metrics.staged("scrape")
+def scrape_and_save(sheets=None):
+    print("\n=== PASO 1: EXTRACCIÓN ===")
+    sheets = sheets or get_sheets()
+    config = get_config(sheets)
+    
+    search_urls = config['sales_nav_urls']
+    if not search_urls: return print("❌ Error: Falta URL Sales Nav")
+    
+    scraper = get_scraper()
+    brain = MeridianBrain()
+    
+    lead_index = get_lead_index(sheets)
+    existing_ids = lead_index.lead_ids()
     
+    print(f"📊 Leads existentes: {len(existing_ids)}")
+    
+    # Tarjetas de una corrida interrumpida que nunca llegaron al Sheet
+    journal = get_journal()
+    carried = journal.pending('card', 'saved')
+    if carried: print(f"♻️ {len(carried)} tarjetas pendientes de la corrida anterior")
+    
+    raw_profiles_data = scraper.get_profiles(search_urls, max_pages=config['max_pages'])
+    print(f"\n📦 Perfiles encontrados: {len(raw_profiles_data)}")
+    journal.record_many('card', [(card_key(card), card) for card in raw_profiles_data])
+    
+    seen = set()
+    raw_profiles_data = [
+        card for card in carried + raw_profiles_data
+        if card_key(card) not in seen and not seen.add(card_key(card))
+    ]
+    
+    quota_report({"gemini": -(-len(raw_profiles_data) // brain.batch_size)})
+    
+    saved = 0
+    new_rows, handled, resolved = [], [], []
+    # Extraemos en batches: un prompt por grupo de perfiles en vez de uno por tarjeta
+    for start in range(0, len(raw_profiles_data), brain.batch_size):
+        if saved >= config['max_leads_day']: break
+        chunk = raw_profiles_data[start:start + brain.batch_size]
+        rows, chunk_handled, chunk_resolved = _build_new_rows(
+            brain, chunk, existing_ids, config['max_leads_day'] - saved, lead_index
+        )
+        new_rows.extend(row for row, _ in rows)
+        handled.extend(chunk_handled)
+        resolved.extend(chunk_resolved)
+        saved += len(rows)
+    
+    # Una sola escritura (o pocas, si el payload es grande) para todos los leads nuevos
+    written = []
+    if new_rows:
+        written = sheets.append_rows("Leads!A2", new_rows)
+        print(f"📝 {len(new_rows)} filas escritas en {len(written)} requests")
+    
+    # Solo si todo quedó escrito: si no, al retomar se reintentan (el índice evita duplicados)
+    from src.sheets import range_rows
+    if sum(len(range_rows(r)) for r in written) == len(new_rows):
+        _mark_saved(journal, lead_index, handled, resolved)
+    
+    print(f"🧠 Llamadas al modelo: {brain.stats['model_calls']} (ahorradas por batching: {brain.calls_saved()})")
+    print(_extraction_line())
+    print(brain.cache.stats_line("Gemini"))
+    metrics.incr("leads_saved", saved)
+    metrics.incr("gemini_calls_saved_batching", brain.calls_saved())
     update_last_run(sheets)
     print(f"✅ Guardados: {saved}")
     return saved
 
-def research_and_evaluate():
+def _research_company(researcher, company, config):
+    """
+    Investiga una empresa una sola vez (se ejecuta dentro del pool de workers).
+    
+    Returns:
+        Tuple: (import_info, urls)
+    """
+    journal = get_journal()
+    key = normalize_company(company)
+    done = journal.get('research', key)
+    if done is not None:
+        return tuple(done)
+    
+    print(f"\n🔍 Analizando: {company}")
+    # Todas las queries de la empresa en paralelo (mismo resultado que la versión secuencial)
+    research = researcher.search_import_data_parallel(company, config['research_queries'])
+    journal.record('research', key, list(research))
+    return research
+
+def _evaluate_lead(brain, lead, research, config):
+    """
+    Evalúa un lead con la investigación compartida de su empresa.
+    
+    Returns:
+        Tuple: (evaluacion, info_text)
+    """
+    name, role, company = lead['name'], lead['role'], lead['company']
+    import_info, serper_urls = research
+    
+    full_info_text = f"{import_info}\n\nFuentes:\n" + "\n".join(serper_urls[:2])
+    full_profile = f"Nombre: {name}\nCargo: {role}\nEmpresa: {company}\nINFO:{import_info}"
+    
+    # Filas sin lead_id (cargadas a mano) se identifican por su número de fila
+    key = lead['lead_id'] or f"row:{lead['row_num']}"
+    journal = get_journal()
+    ev = journal.get('evaluate', key)
+    if ev is None:
+        ev = brain.evaluate_candidate(full_profile, config['icp'])
+        if ev: journal.record('evaluate', key, ev)
+    return ev, full_info_text
+
+def _write_evaluation(sheets, lead, ev, full_info_text):
+    """
+    Encola en el Sheet el resultado de un lead (columnas G..L).
+    
+    Returns:
+        Dict con name, role, company, score, fit, reason, status
+    """
+    score, fit, reason = ev.get('score', 0), ev.get('fit', False), ev.get('reason', '')
+    status = "🔍 Revisar" if score >= 70 else ("🤔 Evaluar" if score >= 40 else "❌ Descartado")
+    
+    row_num = lead['row_num']
+    # Escribimos G..L preservando K (URL original); se envía por batchUpdate
+    sheets.buffer_update(f"Leads!G{row_num}:L{row_num}", [[
+        score, 
+        "✅" if fit else "❌", 
+        reason[:200], 
+        full_info_text[:900], 
+        lead['profile_url'], # PROTEGIDA
+        status
+    ]])
+    print(f"   Score: {score} ({lead['name']}, {lead['company']})")
+    
+    return {
+        'name': lead['name'], 'role': lead['role'], 'company': lead['company'],
+        'score': score, 'fit': fit, 'reason': reason, 'status': status,
+        'lead_id': lead['lead_id'], 'range': f"Leads!G{row_num}:L{row_num}"
+    }
+
+def _journal_writes(results, failed):
+    """Registra en el journal las evaluaciones que sí llegaron al Sheet"""
+    failed = set(failed or [])
+    get_journal().record_many('write', [
+        (r['lead_id'] or r['range'], r['status']) for r in results if r['range'] not in failed
+    ])
+
+def _tally(results):
+    """Convierte resultados de evaluación en (calificados, procesados, descartados)"""
+    qualified = [
+        {k: r[k] for k in ('name', 'role', 'company', 'score', 'reason')}
+        for r in results if r['score'] >= 70
+    ]
+    discarded = sum(1 for r in results if not r['fit'])
+    return qualified, len(results), discarded
+
+@metrics.staged("research")
+def research_and_evaluate(workers=1, sheets=None, serper_batch=False):
+    """
+    Investiga y evalúa los leads pendientes.
+    
+    Args:
+        workers: Hilos para Serper/Gemini
+        serper_batch: Investigar todas las empresas antes de evaluar, con
+                      requests de lote a Serper (muchas queries por POST)
+    """
     print("\n=== PASO 2: INVESTIGACIÓN ===")
-    sheet_id = os.getenv("GOOGLE_SHEET_ID")
-    sheets = SheetsInterface(sheet_id)
+    sheets = sheets or get_sheets()
     config = get_config(sheets)
-    researcher = CompanyResearcherAPI()
+    researcher = get_researcher()
+    connections_before = researcher.connections_opened() or 0
     brain = MeridianBrain()
     
-    leads = sheets.read_range("Leads!A2:L500")
-    if not leads: return [], 0, 0
+    lead_index = get_lead_index(sheets)
+    pending = lead_index.pending()
+    if not pending: return [], 0, 0
+    # Se abre acá, antes del pool: los workers solo consultan el journal
+    get_journal()
     
-    pending_indices = [i for i, r in enumerate(leads) if len(r) > 11 and "Pendiente" in r[11]]
-    print(f"📊 Pendientes: {len(pending_indices)}")
+    # Agrupar por empresa normalizada: se investiga una vez por empresa
+    companies = {}
+    for lead in pending:
+        companies.setdefault(normalize_company(lead['company']), []).append(lead)
     
-    qualified, processed, discarded = [], 0, 0
+    print(f"📊 Pendientes: {len(pending)} en {len(companies)} empresas (workers: {workers})")
     
-    for i in pending_indices:
-        time.sleep(1)
-        row = leads[i]
-        
-        if len(row) < 5: continue
-        name, role, company = row[2], row[3], row[4]
-        # Recuperar URL original (Columna K, indice 10)
-        original_linkedin_url = row[10] if len(row) > 10 else ""
-        
-        print(f"\n🔍 Analizando: {company}")
-        
-        import_info, serper_urls = researcher.search_import_data(company, config['research_queries'])
-        full_info_text = f"{import_info}\n\nFuentes:\n" + "\n".join(serper_urls[:2])
-        full_profile = f"Nombre: {name}\nCargo: {role}\nEmpresa: {company}\nINFO:{import_info}"
-        time.sleep(1)
+    # Cota superior (sin contar aciertos de caché): una query por template y empresa.
+    # Serper cobra por query también en modo lote
+    planned_queries = len(companies) * len([q for q in config['research_queries'].split(",") if q.strip()])
+    quota_report({"serper": planned_queries, "gemini": len(pending), "sheets": len(pending)})
+    
+    results = []
+    
+    # Modo lote: todas las empresas en pocos requests a Serper, antes del pool
+    prefetched = {}
+    if serper_batch:
+        names = [group[0]['company'] for group in companies.values()]
+        try:
+            prefetched = dict(zip(companies, researcher.search_import_data_batch(names, config['research_queries'])))
+        except QuotaExhausted as e:
+            # Un lote entero no entra en lo que queda de cuota: cada empresa lo intenta por su cuenta
+            print(f"⚠️ {e}; se investiga empresa por empresa")
+    
+    # Serper y Gemini corren en el pool; la escritura al Sheet queda en este hilo
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        for key, group in companies.items():
+            if key in prefetched:
+                for lead in group:
+                    running[pool.submit(_evaluate_lead, brain, lead, prefetched[key], config)] = ("evaluate", lead)
+            else:
+                running[pool.submit(_research_company, researcher, group[0]['company'], config)] = ("research", key)
         
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                kind, ref = running.pop(future)
+                
+                if kind == "research":
+                    try:
+                        research = future.result()
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        continue
+                    # Solo la evaluación es por persona
+                    for lead in companies[ref]:
+                        running[pool.submit(_evaluate_lead, brain, lead, research, config)] = ("evaluate", lead)
+                    continue
+                
+                lead = ref
+                try:
+                    ev, full_info_text = future.result()
+                    if ev:
+                        result = _write_evaluation(sheets, lead, ev, full_info_text)
+                        lead_index.set_status(lead['row_num'], result['status'])
+                        results.append(result)
+                except Exception as e: print(f"Error: {e}")
+
+    failed = sheets.flush()
+    if failed: print(f"⚠️ {len(failed)} filas quedaron sin escribir (siguen Pendiente)")
+    _journal_writes(results, failed)
+    print(researcher.cache.stats_line("Serper"))
+    print(researcher.stats_line())
+    print(brain.cache.stats_line("Gemini"))
+    metrics.incr("serper_connections_opened", (researcher.connections_opened() or 0) - connections_before)
+    metrics.incr("leads_evaluated", len(results))
+    update_last_run(sheets)
+    return _tally(results)
+
+def _research_shared(researcher, memo, memo_lock, company, config):
+    """
+    Investigación de empresa compartida entre workers del pipeline.
+    
+    El primer worker que pide una empresa la investiga; los demás esperan
+    su resultado en vez de repetir las búsquedas.
+    """
+    key = normalize_company(company)
+    with memo_lock:
+        future = memo.get(key)
+        owner = future is None
+        if owner:
+            future = memo[key] = Future()
+    
+    if owner:
         try:
-            ev = brain.evaluate_candidate(full_profile, config['icp'])
+            future.set_result(_research_company(researcher, company, config))
+        except Exception as e:
+            future.set_exception(e)
+    return future.result()
+
+@metrics.staged("pipeline")
+def run_pipeline(workers=1, sheets=None):
+    """
+    Modo streaming: scraping, extracción, investigación y evaluación solapados.
+    
+    El scraper entrega página por página a una cola acotada; cada página se
+    extrae y guarda apenas llega, y sus leads nuevos pasan directo al pool de
+    investigación. Ambas colas son acotadas, así que una etapa lenta frena a
+    la anterior en vez de acumular la corrida entera en memoria.
+    
+    Returns:
+        Tuple: (calificados, procesados, descartados)
+    """
+    print("\n=== PIPELINE (streaming) ===")
+    sheets = sheets or get_sheets()
+    config = get_config(sheets)
+    
+    search_urls = config['sales_nav_urls']
+    if not search_urls:
+        print("❌ Error: Falta URL Sales Nav")
+        return [], 0, 0
+    
+    from src.sheets import range_rows
+    scraper = get_scraper()
+    brain = MeridianBrain()
+    researcher = get_researcher()
+    connections_before = researcher.connections_opened() or 0
+    lead_index = get_lead_index(sheets)
+    existing_ids = lead_index.lead_ids()
+    
+    started = time.monotonic()
+    pages = queue.Queue(maxsize=PIPELINE_QUEUE_PAGES)
+    stop = threading.Event()
+    
+    # Tarjetas de una corrida interrumpida que nunca llegaron al Sheet: van primero
+    journal = get_journal()
+    carried = journal.pending('card', 'saved')
+    if carried: print(f"♻️ {len(carried)} tarjetas pendientes de la corrida anterior")
+    
+    # Proyección con el cupo diario como tope: cada lead nuevo se investiga
+    # (una query por template, sin contar caché) y se evalúa una vez
+    leads = config['max_leads_day']
+    templates = len([q for q in config['research_queries'].split(",") if q.strip()])
+    quota_report({
+        "serper": leads * templates,
+        "gemini": leads + -(-leads // brain.batch_size),
+        "sheets": leads,
+    })
+    
+    def produce():
+        # Playwright síncrono: el generador vive entero en este hilo
+        try:
+            if carried: pages.put(carried)
+            for cards in scraper.iter_pages(search_urls, max_pages=config['max_pages']):
+                pages.put(cards)
+                if stop.is_set(): break
+        finally:
+            pages.put(None)
+    
+    producer = threading.Thread(target=produce, name="scraper", daemon=True)
+    producer.start()
+    
+    memo, memo_lock = {}, threading.Lock()
+    # Leads en vuelo acotados: si la investigación se atrasa, la extracción espera
+    slots = threading.BoundedSemaphore(workers * PIPELINE_LEADS_PER_WORKER)
+    results, results_lock = [], threading.Lock()
+    
+    def process(lead):
+        try:
+            research = _research_shared(researcher, memo, memo_lock, lead['company'], config)
+            ev, full_info_text = _evaluate_lead(brain, lead, research, config)
             if ev:
-                score, fit, reason = ev.get('score', 0), ev.get('fit', False), ev.get('reason', '')
-                status = "🔍 Revisar" if score >= 70 else ("🤔 Evaluar" if score >= 40 else "❌ Descartado")
-                if not fit: discarded += 1
-                if score >= 70: 
-                    qualified.append({'name': name, 'role': role, 'company': company, 'score': score, 'reason': reason})
-
-                row_num = i + 2
-                # Escribimos G..L preservando K (URL original)
-                sheets.update_range(f"Leads!G{row_num}:L{row_num}", [[
-                    score, 
-                    "✅" if fit else "❌", 
-                    reason[:200], 
-                    full_info_text[:900], 
-                    original_linkedin_url, # PROTEGIDA
-                    status
-                ]])
-                print(f"   Score: {score}")
-                processed += 1
+                result = _write_evaluation(sheets, lead, ev, full_info_text)
+                with results_lock:
+                    first = result['score'] >= 70 and not any(r['score'] >= 70 for r in results)
+                    results.append(result)
+                if first:
+                    print(f"   ⏱️ Primer lead calificado a los {time.monotonic() - started:.0f}s")
         except Exception as e: print(f"Error: {e}")
-
+        finally: slots.release()
+    
+    saved = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            cards = pages.get()
+            if cards is None: break
+            # Cupo diario cubierto: solo drenamos hasta que el scraper se detenga
+            if saved >= config['max_leads_day']: continue
+            
+            journal.record_many('card', [(card_key(card), card) for card in cards])
+            rows, handled, resolved = _build_new_rows(
+                brain, cards, existing_ids, config['max_leads_day'] - saved, lead_index
+            )
+            if not rows:
+                _mark_saved(journal, lead_index, handled, resolved)
+                continue
+            
+            written = sheets.append_rows("Leads!A2", [row for row, _ in rows])
+            row_nums = [n for r in written for n in range_rows(r)]
+            if len(row_nums) != len(rows):
+                print("   ⚠️ No se pudo ubicar las filas escritas; se investigarán en la próxima corrida")
+                continue
+            _mark_saved(journal, lead_index, handled, resolved)
+            
+            saved += len(rows)
+            if saved >= config['max_leads_day']: stop.set()
+            
+            for (row, item), row_num in zip(rows, row_nums):
+                lead = {
+                    'row_num': row_num, 'lead_id': row[0], 'name': row[2],
+                    'role': row[3], 'company': row[4], 'profile_url': row[10]
+                }
+                slots.acquire()
+                pool.submit(process, lead)
+    
+    producer.join()
+    failed = sheets.flush()
+    if failed: print(f"⚠️ {len(failed)} filas quedaron sin escribir (siguen Pendiente)")
+    _journal_writes(results, failed)
+    print(f"✅ Guardados: {saved} en {time.monotonic() - started:.0f}s")
+    print(f"🧠 Llamadas al modelo: {brain.stats['model_calls']} (ahorradas por batching: {brain.calls_saved()})")
+    print(_extraction_line())
+    print(researcher.cache.stats_line("Serper"))
+    print(researcher.stats_line())
+    print(brain.cache.stats_line("Gemini"))
+    metrics.incr("serper_connections_opened", (researcher.connections_opened() or 0) - connections_before)
+    metrics.incr("leads_evaluated", len(results))
     update_last_run(sheets)
-    return qualified, processed, discarded
+    return _tally(results)
 
+def invalidate_cache(scope="evaluate"):
+    """
+    Limpia la caché de Gemini. Usar tras cambiar el ICP en Config!B2.
+    
+    Args:
+        scope: 'evaluate' (default), 'extract' o 'all'
+    """
+    if scope not in ("evaluate", "extract", "all"):
+        return print(f"❌ Alcance desconocido: {scope} (usa evaluate | extract | all)")
+    from src.brain import clear_cache
+    deleted = clear_cache(None if scope == "all" else scope)
+    print(f"🧹 Caché Gemini ({scope}): {deleted} entradas eliminadas")
+
+@metrics.staged("notify")
 def send_notification(qualified, total, discarded):
     print("\n=== PASO 3: NOTIFICACIÓN ===")
-    notifier = EmailNotifier()
+    notifier = get_notifier()
     stats = {'total': total, 'qualified': len(qualified), 'discarded': discarded}
     qualified.sort(key=lambda x: x.get('score', 0), reverse=True)
     notifier.send_daily_summary(stats, qualified)
 
-def run_full():
-    scrape_and_save()
-    q, t, d = research_and_evaluate()
+def run_full(workers=1, stream=False, serper_batch=False):
+    # Una sola autenticación y lectura de Config para ambas etapas
+    sheets = get_sheets()
+    if stream:
+        q, t, d = run_pipeline(workers, sheets)
+    else:
+        scrape_and_save(sheets)
+        q, t, d = research_and_evaluate(workers, sheets, serper_batch)
     if t > 0: send_notification(q, t, d)
 
+def _daemon_should_scrape(config, last_scrape_day, now):
+    """El scrape del daemon corre una vez al día, pasada la hora 'Scrape Time'"""
+    if not config['scrape_time'] or last_scrape_day == now.date():
+        return False
+    return now.time() >= config['scrape_time']
+
+def _daemon_should_notify(config, digest, now):
+    """
+    El resumen del daemon sale una vez al día: pasada la hora 'Scrape Time'
+    (antes del scrape nuevo) o, sin Scrape Time, al cambiar el día.
+    """
+    if not digest['processed'] or digest['sent_day'] == now.date():
+        return False
+    if config['scrape_time']:
+        return now.time() >= config['scrape_time']
+    return now.date() > digest['since']
+
+def run_daemon(workers=1):
+    """
+    Proceso de larga duración: mantiene Sheets, Serper y Gmail autenticados
+    y las cachés abiertas, y cada 'Poll Minutes' (Config) relee el Config:
+    
+    - Auto Run = No: no hace nada hasta el próximo ciclo.
+    - Scrape Time (HH:MM): un scrape diario pasada esa hora.
+    - Filas "Pendiente" nuevas: se investigan apenas aparecen, sin esperar
+      al batch diario.
+    - Resumen por email: uno por día con lo evaluado en todos los ciclos.
+    
+    Cada ciclo con trabajo deja su reporte en data/runs/. Se detiene con
+    Ctrl+C o SIGTERM al terminar el ciclo en curso.
+    """
+    print("\n=== DAEMON ===")
+    stop = threading.Event()
+    
+    def request_stop(signum, frame):
+        # Primer Ctrl+C/SIGTERM: terminar el ciclo en curso; el segundo corta ya
+        if stop.is_set() and signum == signal.SIGINT:
+            raise KeyboardInterrupt
+        print("\n🛑 Deteniendo al terminar el ciclo en curso (Ctrl+C otra vez para cortar ya)")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    sheets = get_sheets()
+    last_scrape_day = None
+    # Evaluaciones acumuladas entre ciclos hasta el próximo resumen diario
+    digest = {'qualified': [], 'processed': 0, 'discarded': 0, 'since': datetime.now().date(), 'sent_day': None}
+    
+    try:
+        while not stop.is_set():
+            config = get_config(sheets, refresh=True)
+            interval = max(1.0, config['poll_minutes']) * 60
+        
+            if not config['auto_run']:
+                print(f"⏸️ Auto Run desactivado en Config; reviso de nuevo en {interval / 60:.0f} min")
+                stop.wait(interval)
+                continue
+        
+            metrics.reset()
+            worked = False
+            try:
+                now = datetime.now()
+                if _daemon_should_notify(config, digest, now):
+                    send_notification(digest['qualified'], digest['processed'], digest['discarded'])
+                    digest.update(qualified=[], processed=0, discarded=0, since=now.date(), sent_day=now.date())
+                    worked = True
+            
+                if _daemon_should_scrape(config, last_scrape_day, now):
+                    scrape_and_save(sheets)
+                    last_scrape_day = now.date()
+                    worked = True
+            
+                # Sync incremental del índice: solo trae filas nuevas y cambios de status
+                if get_lead_index(sheets).pending():
+                    q, t, d = research_and_evaluate(workers, sheets)
+                    digest['qualified'].extend(q)
+                    digest['processed'] += t
+                    digest['discarded'] += d
+                    worked = True
+            
+                if worked: finish_run()
+            except Exception as e:
+                # El journal queda abierto: el próximo ciclo retoma lo que faltó
+                print(f"❌ Error en el ciclo del daemon: {e}")
+                worked = True
+            finally:
+                if worked: write_run_report()
+        
+            if not worked: print(f"💤 Sin leads pendientes; reviso de nuevo en {interval / 60:.0f} min")
+            stop.wait(interval)
+    finally:
+        # Lo evaluado desde el último resumen no se pierde al detener el daemon
+        if digest['processed']:
+            send_notification(digest['qualified'], digest['processed'], digest['discarded'])
+    print("👋 Daemon detenido")
+
 # === MENÚ DE COMANDOS RESTAURADO ===
+# Comandos que corren el pipeline y dejan reporte de métricas en data/runs/
+RUN_COMMANDS = ("full", "scrape", "research")
+
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        # Desglose de imports del subcomando (python main.py status --profile-startup)
+        from src.startup import profile_startup
+        sys.exit(profile_startup(sys.argv))
+    
     if len(sys.argv) > 1:
         cmd = sys.argv[1].lower()
-        if cmd == "full": run_full()
-        elif cmd == "scrape": scrape_and_save()
-        elif cmd == "research":
-            q, t, d = research_and_evaluate()
-            if t > 0: send_notification(q, t, d)
-        elif cmd == "test-email":
-            # Invocamos la prueba del notificador
-            from src.notifier import test_email
-            test_email()
-        elif cmd == "status":
-            print("Usa el comando status original si lo necesitas.")
-        else:
-            print(f"Comando desconocido: {cmd}")
-            print("Uso: python main.py [full | scrape | research | test-email]")
+        workers = max(1, int(get_option("--workers", os.getenv("RESEARCH_WORKERS", "1"))))
+        serper_batch = "--serper-batch" in sys.argv or os.getenv("SERPER_BATCH_MODE") == "1"
+        try:
+            if cmd == "full": run_full(workers, stream="--stream" in sys.argv, serper_batch=serper_batch)
+            elif cmd == "scrape": scrape_and_save()
+            elif cmd == "research":
+                q, t, d = research_and_evaluate(workers, serper_batch=serper_batch)
+                if t > 0: send_notification(q, t, d)
+            elif cmd == "daemon":
+                try: run_daemon(workers)
+                except KeyboardInterrupt: print("\n👋 Daemon detenido (ciclo interrumpido)")
+            elif cmd == "replay":
+                if len(sys.argv) < 3: print("Uso: python main.py replay ARCHIVO.jsonl.gz [--repeat N] [--workers N]")
+                else: run_replay(sys.argv[2], int(get_option("--repeat", "1")), int(get_option("--workers", "0")) or None)
+            elif cmd == "test-email":
+                # Invocamos la prueba del notificador
+                from src.notifier import test_email
+                test_email()
+            elif cmd == "invalidate-cache":
+                invalidate_cache(sys.argv[2].lower() if len(sys.argv) > 2 else "evaluate")
+            elif cmd == "status":
+                print("Usa el comando status original si lo necesitas.")
+            else:
+                print(f"Comando desconocido: {cmd}")
+                print("Uso: python main.py [full | scrape | research | daemon | replay | test-email | invalidate-cache] [--workers N] [--stream] [--serper-batch] [--snapshot | --replay ARCHIVO] [--profile-startup]")
+            
+            # Corrida completa: el journal ya no hace falta para retomar
+            if cmd in RUN_COMMANDS: finish_run()
+        finally:
+            # También tras un error: el reporte muestra dónde se fue el tiempo
+            if cmd in RUN_COMMANDS: write_run_report()
     else:
-        print("Uso: python main.py [full | scrape | research | test-email]")
\ No newline at end of file
+        print("Uso: python main.py [full | scrape | research | daemon | replay | test-email | invalidate-cache] [--workers N] [--stream] [--serper-batch] [--snapshot | --replay ARCHIVO] [--profile-startup]")
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Credenciales OAuth 2.0 y clientes de Google compartidos
+Sheets y Gmail usan el mismo token.json: se carga (y refresca) una sola vez
+por proceso con la unión de scopes, y cada servicio se construye una vez
+con el discovery document que trae googleapiclient (sin red).
+"""
+
+import os
+import threading
+
+TOKEN_PATH = "token.json"
+CREDENTIALS_PATH = "credentials.json"
+
+# Unión de lo que necesitan SheetsInterface y EmailNotifier
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/gmail.send'
+]
+
+_lock = threading.RLock()
+_creds = None
+_services = {}
+
+
+def _save_token(creds):
+    """Escritura atómica: otro proceso (cron, daemon) nunca lee un token a medias"""
+    tmp_path = f"{TOKEN_PATH}.tmp"
+    with open(tmp_path, 'w') as token:
+        token.write(creds.to_json())
+    os.replace(tmp_path, TOKEN_PATH)
+
+
+def _load_credentials():
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
+    creds = None
+    if os.path.exists(TOKEN_PATH):
+        try:
+            # Sin pasar scopes: así quedan los que el token realmente tiene
+            creds = Credentials.from_authorized_user_file(TOKEN_PATH)
+        except Exception as e:
+            print(f"⚠️ token.json inválido, se pedirá autorización de nuevo: {e}")
+            creds = None
+
+    # Un token viejo de solo Sheets (o solo Gmail) no sirve para ambos
+    if creds and not creds.has_scopes(SCOPES):
+        creds = None
+
+    if creds and creds.valid:
+        return creds
+
+    if creds and creds.expired and creds.refresh_token:
+        try:
+            creds.refresh(Request())
+            _save_token(creds)
+            return creds
+        except Exception as e:
+            print(f"⚠️ No se pudo refrescar el token: {e}")
+
+    if not os.path.exists(CREDENTIALS_PATH):
+        print(f"❌ Error: No se encontró {CREDENTIALS_PATH}")
+        return None
+
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+    creds = flow.run_local_server(port=0)
+    _save_token(creds)
+    return creds
+
+
+def get_credentials():
+    """
+    Credenciales compartidas por todo el proceso (thread-safe).
+
+    Returns:
+        google.oauth2.credentials.Credentials, o None si no hay forma de autenticar
+    """
+    global _creds
+    with _lock:
+        if _creds is None or not _creds.valid:
+            _creds = _load_credentials()
+        return _creds
+
+
+def get_service(api, version):
+    """
+    Cliente de googleapiclient cacheado por (api, versión).
+
+    El discovery document sale del paquete (static_discovery), así que
+    construir el cliente no hace requests.
+
+    Returns:
+        Resource de googleapiclient, o None si no hay credenciales
+    """
+    with _lock:
+        key = (api, version)
+        if key not in _services:
+            creds = get_credentials()
+            if creds is None:
+                return None
+            from googleapiclient.discovery import build
+            _services[key] = build(api, version, credentials=creds, static_discovery=True, cache_discovery=False)
+        return _services[key]
@@ -4,22 +4,113 @@ Cerebro de Meridian - Evaluación de leads con Gemini
 
 import os
 import json
+import threading
 from google import genai
 from dotenv import load_dotenv
+from src.ratelimit import get_limiter
+from src.cache import CACHE_DIR, SQLiteCache, make_key
+from src.metrics import metrics
 
 load_dotenv()
 
+GEMINI_CACHE_PATH = os.path.join(CACHE_DIR, "gemini.sqlite")
+
+# Subir la versión cuando cambie el texto de un prompt: invalida sus entradas en caché
+PROMPT_VERSIONS = {
+    'extract': 1,
+    'evaluate': 1,
+}
+
+
+def open_cache():
+    """Caché de respuestas parseadas de Gemini (compartida por extracción y evaluación)"""
+    return SQLiteCache(
+        GEMINI_CACHE_PATH,
+        max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "20000"))
+    )
+
+
+def clear_cache(kind=None):
+    """
+    Invalida la caché de Gemini.
+    
+    Args:
+        kind: 'extract', 'evaluate' o None para todo
+    
+    Returns:
+        Número de entradas eliminadas
+    """
+    return open_cache().clear(prefix=f"{kind}:" if kind else None)
+
 
 class MeridianBrain:
     
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        
-        if not api_key:
-            raise ValueError("❌ GEMINI_API_KEY no encontrada en .env")
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Cliente compatible con genai.Client (benchmarks); si no, usa GEMINI_API_KEY
+        """
+        if client is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            
+            if not api_key:
+                raise ValueError("❌ GEMINI_API_KEY no encontrada en .env")
+            
+            client = genai.Client(api_key=api_key)
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = client
         self.model = "gemini-2.0-flash"  # Rápido y barato
+        self.batch_size = int(os.getenv("GEMINI_BATCH_SIZE", "20"))
+        self.limiter = get_limiter("gemini")
+        self.cache = open_cache()
+        
+        # Contadores de uso del modelo para el reporte de cada corrida
+        self.stats = {
+            'model_calls': 0,      # Llamadas reales a generate_content
+            'batch_calls': 0,      # Llamadas de extracción en batch
+            'batch_items': 0,      # Perfiles resueltos dentro de un batch
+            'fallback_items': 0,   # Perfiles que requirieron llamada individual
+        }
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, key, amount=1):
+        """Incrementa un contador (seguro con varios workers)"""
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def _generate_json(self, prompt):
+        """
+        Llama al modelo pidiendo respuesta JSON y la parsea.
+        
+        Raises:
+            json.JSONDecodeError si la respuesta no es JSON válido
+        """
+        self.limiter.acquire()
+        self._count('model_calls')
+        with metrics.track("gemini", "generate_content") as call:
+            try:
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config={
+                        'response_mime_type': 'application/json'
+                    }
+                )
+            except Exception as e:
+                # google-genai expone el código HTTP en .code (429 = RESOURCE_EXHAUSTED)
+                self.limiter.report(getattr(e, 'code', None))
+                raise
+            self.limiter.report(200)
+            call['bytes'] = len(prompt.encode()) + len((response.text or "").encode())
+        return json.loads(response.text)
+    
+    def _memo_key(self, kind, *parts):
+        """Clave por contenido: modelo + versión del prompt + entradas"""
+        return f"{kind}:{make_key(self.model, kind, PROMPT_VERSIONS[kind], *parts)}"
+    
+    def calls_saved(self):
+        """Llamadas al modelo evitadas gracias al batching (vs. una por perfil)"""
+        return self.stats['batch_items'] - self.stats['batch_calls']
     
     def extract_profile_info(self, profile_text):
         """
@@ -31,6 +122,18 @@ class MeridianBrain:
         Returns:
             Dict con name, role, company
         """
+        key = self._memo_key('extract', profile_text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = self._extract_single(profile_text)
+        if result:
+            self.cache.set(key, result)
+        return result
+    
+    def _extract_single(self, profile_text):
+        """Extracción de un perfil con una llamada al modelo (sin caché)"""
         
         prompt = f"""
 Extrae la información de este perfil de LinkedIn Sales Navigator.
@@ -46,15 +149,7 @@ Si no encuentras algún campo, usa null.
 """
         
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config={
-                    'response_mime_type': 'application/json'
-                }
-            )
-            
-            result = json.loads(response.text)
+            result = self._generate_json(prompt)
             
             # Manejar si devuelve lista
             if isinstance(result, list):
@@ -69,6 +164,117 @@ Si no encuentras algún campo, usa null.
             print(f"      ❌ Error en extracción: {e}")
             return None
     
+    def extract_profiles_batch(self, texts, batch_size=None):
+        """
+        Extrae información de muchos perfiles empaquetándolos en un solo prompt.
+        
+        Cada batch se envía como un array numerado y la respuesta se mapea
+        de vuelta por índice. Solo los perfiles que el modelo omitió o
+        devolvió mal formados se reintentan con extract_profile_info.
+        
+        Args:
+            texts: Lista de textos crudos de perfiles
+            batch_size: Perfiles por llamada (default GEMINI_BATCH_SIZE)
+        
+        Returns:
+            Lista alineada con texts: Dict con name, role, company o None
+        """
+        batch_size = batch_size or self.batch_size
+        results = [None] * len(texts)
+        keys = [self._memo_key('extract', text) for text in texts]
+        
+        # Solo van al modelo los perfiles que no están en caché
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.append(i)
+        
+        for start in range(0, len(missing), batch_size):
+            chunk_indices = missing[start:start + batch_size]
+            parsed = self._extract_chunk([texts[i] for i in chunk_indices])
+            
+            for offset, i in enumerate(chunk_indices):
+                item = parsed.get(offset)
+                if item is not None:
+                    self._count('batch_items')
+                else:
+                    # Fallback individual solo para lo que el batch perdió
+                    self._count('fallback_items')
+                    item = self._extract_single(texts[i])
+                
+                if item:
+                    self.cache.set(keys[i], item)
+                results[i] = item
+        
+        return results
+    
+    def _extract_chunk(self, chunk):
+        """
+        Envía un grupo de perfiles en un solo prompt.
+        
+        Returns:
+            Dict {indice_en_chunk: {name, role, company}} solo con entradas válidas
+        """
+        if len(chunk) == 1:
+            # Un batch de uno no ahorra nada: mejor usar el prompt simple
+            return {}
+        
+        profiles_block = "\n\n".join(
+            f"PERFIL {i}:\n{text}" for i, text in enumerate(chunk)
+        )
+        
+        prompt = f"""
+Extrae la información de cada uno de estos {len(chunk)} perfiles de LinkedIn Sales Navigator.
+Responde SOLO con un array JSON válido, sin texto adicional.
+Incluye un objeto por perfil con el mismo "index" que su encabezado PERFIL.
+
+{profiles_block}
+
+Formato de respuesta (array JSON):
+[{{"index": 0, "name": "Nombre Completo", "role": "Cargo", "company": "Empresa"}}]
+
+Si no encuentras algún campo, usa null.
+"""
+        
+        try:
+            self._count('batch_calls')
+            result = self._generate_json(prompt)
+        except json.JSONDecodeError as e:
+            print(f"      ⚠️ Error parseando JSON del batch: {e}")
+            return {}
+        except Exception as e:
+            print(f"      ❌ Error en extracción batch: {e}")
+            return {}
+        
+        if isinstance(result, dict):
+            # Algunos modelos envuelven el array: {"profiles": [...]}
+            result = next((v for v in result.values() if isinstance(v, list)), [])
+        if not isinstance(result, list):
+            return {}
+        
+        parsed = {}
+        for entry in result:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get('index'))
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < len(chunk) or index in parsed:
+                continue
+            if not all(key in entry for key in ('name', 'role', 'company')):
+                continue
+            parsed[index] = {
+                'name': entry.get('name'),
+                'role': entry.get('role'),
+                'company': entry.get('company'),
+            }
+        
+        return parsed
+    
     def evaluate_candidate(self, profile_with_research, icp_criteria):
         """
         Evalúa si un candidato cumple con el ICP.
@@ -80,6 +286,10 @@ Si no encuentras algún campo, usa null.
         Returns:
             Dict con fit, score, reason
         """
+        key = self._memo_key('evaluate', icp_criteria, profile_with_research)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
         
         prompt = f"""
 Eres un BDR Senior experto en calificación de leads B2B.
@@ -109,15 +319,7 @@ Responde SOLO en JSON válido:
 """
         
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config={
-                    'response_mime_type': 'application/json'
-                }
-            )
-            
-            result = json.loads(response.text)
+            result = self._generate_json(prompt)
             
             # Manejar si devuelve lista
             if isinstance(result, list):
@@ -128,6 +330,7 @@ Responde SOLO en JSON válido:
                 result['fit'] = bool(result.get('fit', False))
                 result['score'] = int(result.get('score', 0))
                 result['reason'] = str(result.get('reason', ''))[:300]
+                self.cache.set(key, result)
             
             return result
             
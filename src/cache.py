@@ -0,0 +1,118 @@
+"""
+Caché persistente en SQLite para respuestas de APIs externas
+TTL configurable y tope de tamaño con desalojo LRU.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = "./data/cache"
+
+
+def make_key(*parts):
+    """Hash estable de las partes que identifican una entrada"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def normalize_query(query):
+    """Normaliza una búsqueda: minúsculas y espacios colapsados"""
+    return " ".join(query.lower().split())
+
+
+class SQLiteCache:
+
+    def __init__(self, path, ttl_seconds=None, max_entries=None):
+        """
+        Args:
+            path: Archivo SQLite (se crea si no existe)
+            ttl_seconds: Vigencia de cada entrada (None = sin expiración)
+            max_entries: Tope de entradas; se desalojan las menos usadas
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Compartida entre workers: serializamos el acceso con self.lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed)")
+        self.conn.commit()
+
+    def get(self, key):
+        """
+        Busca una entrada vigente.
+
+        Returns:
+            Valor deserializado o None si no existe / expiró
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.conn.commit()
+                row = None
+
+            if not row:
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Guarda un valor serializable a JSON y aplica el tope LRU"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            if self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    " SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self.conn.commit()
+
+    def clear(self, prefix=None):
+        """
+        Elimina entradas.
+
+        Args:
+            prefix: Si se indica, solo las claves que empiezan con él
+        """
+        with self.lock:
+            if prefix:
+                deleted = self.conn.execute(
+                    "DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+                ).rowcount
+            else:
+                deleted = self.conn.execute("DELETE FROM entries").rowcount
+            self.conn.commit()
+        return deleted
+
+    def stats_line(self, label):
+        """Resumen de hits/misses para imprimir al final de la corrida"""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        return f"🗄️ Caché {label}: {self.hits} hits / {self.misses} misses ({rate:.0f}%)"
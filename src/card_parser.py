@@ -0,0 +1,151 @@
+"""
+Parser de tarjetas de Sales Navigator a partir de HTML guardado
+Replica sin navegador la extracción de MeridianScraper: mismos selectores,
+mismo fallback y misma limpieza de URL.
+"""
+
+from html.parser import HTMLParser
+
+from src.profile_parser import FIELD_ATTRS
+
+# Selectores de tarjeta, en el orden en que los prueba el scraper
+CARD_CLASS = "artdeco-entity-lockup"
+CARD_ATTR = "data-x--lead-card"
+
+LINK_CONTROL_NAME = "view_lead_panel_via_search_result"
+TITLE_CLASS = "artdeco-entity-lockup__title"
+
+MIN_TEXT_LENGTH = 20
+
+# Etiquetas que en inner_text generan salto de línea
+BLOCK_TAGS = {
+    "address", "article", "aside", "br", "dd", "div", "dl", "dt", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "ol", "p",
+    "section", "table", "tr", "ul",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+SKIP_TAGS = {"script", "style", "template"}
+
+
+def clean_profile_url(href):
+    """Quita query params y arma la URL absoluta (igual que el scraper)"""
+    if not href:
+        return ""
+    return f"https://www.linkedin.com{href.split('?')[0]}"
+
+
+def normalize_profile_url(url):
+    """
+    Identidad estable de un perfil: la URL de Sales Nav trae, después del id
+    del lead, sufijos de la búsqueda (',NAME_SEARCH,xyz') y query params.
+    El id distingue mayúsculas, así que no se pasa a minúsculas.
+    """
+    if not url:
+        return ""
+    path = url.split("?")[0].split("#")[0].split(",")[0]
+    return path.rstrip("/")
+
+
+def normalize_inner_text(text):
+    """Colapsa espacios y líneas vacías como lo hace inner_text()"""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class _CardCollector(HTMLParser):
+    """Recorre el HTML una vez y junta las tarjetas más externas que cumplen is_card"""
+
+    def __init__(self, is_card):
+        super().__init__(convert_charrefs=True)
+        self.is_card = is_card
+        self.cards = []
+        self._card = None      # Tarjeta en curso
+        self._stack = []       # Clases de los elementos abiertos dentro de la tarjeta
+        self._fields = []      # Campo data-anonymize de cada elemento abierto (o None)
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+
+        if self._card is None:
+            if self.is_card(classes, attrs):
+                self._card = {"chunks": [], "link": "", "title_link": "", "fields": {}}
+                self._stack = [classes]
+                self._fields = [None]
+            return
+
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        if tag in BLOCK_TAGS:
+            self._card["chunks"].append("\n")
+
+        if tag == "a" and attrs.get("href"):
+            if attrs.get("data-control-name") == LINK_CONTROL_NAME and not self._card["link"]:
+                self._card["link"] = attrs["href"]
+            elif not self._card["title_link"] and any(TITLE_CLASS in c for c in self._stack):
+                self._card["title_link"] = attrs["href"]
+
+        if tag not in VOID_TAGS:
+            self._stack.append(classes)
+            field = FIELD_ATTRS.get(attrs.get("data-anonymize"))
+            # Solo el primer elemento de cada campo (igual que querySelector)
+            if field in self._card["fields"] or field in self._fields:
+                field = None
+            self._fields.append(field)
+
+    def handle_endtag(self, tag):
+        if self._card is None or tag in VOID_TAGS:
+            return
+        if tag in SKIP_TAGS and self._skip:
+            self._skip -= 1
+        if tag in BLOCK_TAGS:
+            self._card["chunks"].append("\n")
+
+        self._stack.pop()
+        field = self._fields.pop()
+        if field:
+            self._card["fields"][field] = "".join(self._card["fields"].get(field, []))
+        if not self._stack:
+            self._finish_card()
+
+    def handle_data(self, data):
+        if self._card is not None and not self._skip:
+            self._card["chunks"].append(data)
+            for field in filter(None, self._fields):
+                self._card["fields"].setdefault(field, []).append(data)
+
+    def _finish_card(self):
+        card, self._card = self._card, None
+        self.cards.append({
+            "text": normalize_inner_text("".join(card["chunks"])),
+            "url": clean_profile_url(card["link"] or card["title_link"]),
+            "fields": {
+                field: " ".join(value.split()) for field, value in card["fields"].items()
+                if isinstance(value, str) and value.strip()
+            },
+        })
+
+
+def _collect(html, is_card):
+    parser = _CardCollector(is_card)
+    parser.feed(html)
+    parser.close()
+    return parser.cards
+
+
+def parse_cards_html(html):
+    """
+    Extrae las tarjetas de una página de resultados guardada.
+
+    Args:
+        html: HTML completo de la página
+
+    Returns:
+        Lista de diccionarios {'text': str, 'url': str, 'fields': dict}
+    """
+    cards = _collect(html, lambda classes, attrs: CARD_CLASS in classes)
+    if not cards:
+        cards = _collect(html, lambda classes, attrs: CARD_ATTR in attrs)
+
+    return [card for card in cards if card["text"] and len(card["text"]) > MIN_TEXT_LENGTH]
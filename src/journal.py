@@ -0,0 +1,169 @@
+"""
+Journal local de la corrida (SQLite)
+Registra cada unidad de trabajo (tarjeta scrapeada, extracción,
+investigación, evaluación, escritura al Sheet). Si la corrida se cae, la
+siguiente retoma desde el último paso registrado sin repetir llamadas
+pagadas; al terminar bien, el journal se compacta.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+JOURNAL_PATH = "./data/journal.sqlite"
+
+# Tarjetas diferidas (sin guardar al cerrar una corrida) que se descartan por viejas
+DEFERRED_MAX_AGE_DAYS = 7
+
+
+def card_key(card):
+    """Identidad de una tarjeta scrapeada (URL + texto)"""
+    raw = f"{card.get('url', '')}\n{card.get('text', '')}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class RunJournal:
+
+    def __init__(self, path=JOURNAL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS steps ("
+            " run_id TEXT, kind TEXT, key TEXT, value TEXT, created_at REAL,"
+            " PRIMARY KEY (run_id, kind, key))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, started_at REAL, completed_at REAL, steps INTEGER)"
+        )
+        # Tarjetas scrapeadas que no llegaron al Sheet (cupo diario, falla del modelo):
+        # sobreviven al cierre de la corrida y entran en la siguiente
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS deferred (key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+        )
+        self.conn.commit()
+        self.run_id = None
+
+    def begin(self):
+        """
+        Abre la corrida: retoma la última que quedó sin completar o empieza una nueva.
+
+        Returns:
+            True si se retomó una corrida interrumpida
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT run_id FROM runs WHERE completed_at IS NULL ORDER BY started_at DESC LIMIT 1"
+            ).fetchone()
+            if row:
+                self.run_id = row[0]
+                steps = self.conn.execute(
+                    "SELECT COUNT(*) FROM steps WHERE run_id = ?", (self.run_id,)
+                ).fetchone()[0]
+                print(f"♻️ Retomando corrida {self.run_id} ({steps} pasos ya registrados)")
+                return True
+
+            # Con milisegundos: scrape y research seguidos pueden abrir corridas en el mismo segundo
+            self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, started_at) VALUES (?, ?)", (self.run_id, time.time())
+            )
+            # Las tarjetas diferidas pasan a ser tarjetas pendientes de esta corrida
+            self.conn.execute(
+                "DELETE FROM deferred WHERE created_at < ?", (time.time() - DEFERRED_MAX_AGE_DAYS * 86400,)
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO steps (run_id, kind, key, value, created_at)"
+                " SELECT ?, 'card', key, value, created_at FROM deferred",
+                (self.run_id,)
+            )
+            self.conn.execute("DELETE FROM deferred")
+            self.conn.commit()
+            return False
+
+    # --- Pasos ---
+
+    def record(self, kind, key, value=None):
+        """Registra (y confirma en disco) un paso terminado"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO steps (run_id, kind, key, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, kind, key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+            self.conn.commit()
+
+    def record_many(self, kind, items):
+        """Registra varios pasos en una sola transacción: items = [(key, value), ...]"""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO steps (run_id, kind, key, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(self.run_id, kind, key, json.dumps(value, ensure_ascii=False), now) for key, value in items]
+            )
+            self.conn.commit()
+
+    def get(self, kind, key, default=None):
+        """Resultado registrado de un paso, o default si no se hizo"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM steps WHERE run_id = ? AND kind = ? AND key = ?", (self.run_id, kind, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def pending(self, kind, done_kind):
+        """
+        Pasos 'kind' sin su 'done_kind' correspondiente (ej: tarjetas scrapeadas
+        que nunca llegaron al Sheet), en orden de registro.
+
+        Returns:
+            Lista de valores registrados
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT s.value FROM steps s WHERE s.run_id = ? AND s.kind = ? AND NOT EXISTS ("
+                " SELECT 1 FROM steps d WHERE d.run_id = s.run_id AND d.kind = ? AND d.key = s.key)"
+                " ORDER BY s.created_at",
+                (self.run_id, kind, done_kind)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    # --- Cierre ---
+
+    def complete(self):
+        """
+        Marca la corrida como terminada y compacta: los pasos ya viven en el
+        Sheet y las cachés. Solo las tarjetas sin guardar se conservan, como
+        diferidas para la próxima corrida; research/evaluate/extract no se
+        reutilizan (así rigen los TTL de caché e invalidate-cache).
+
+        Returns:
+            Número de tarjetas diferidas
+        """
+        with self.lock:
+            steps = self.conn.execute(
+                "SELECT COUNT(*) FROM steps WHERE run_id = ?", (self.run_id,)
+            ).fetchone()[0]
+            deferred = self.conn.execute(
+                "INSERT OR REPLACE INTO deferred (key, value, created_at)"
+                " SELECT s.key, s.value, s.created_at FROM steps s WHERE s.run_id = ? AND s.kind = 'card'"
+                " AND NOT EXISTS (SELECT 1 FROM steps d WHERE d.run_id = s.run_id AND d.kind = 'saved' AND d.key = s.key)",
+                (self.run_id,)
+            ).rowcount
+            self.conn.execute("DELETE FROM steps WHERE run_id = ?", (self.run_id,))
+            self.conn.execute(
+                "UPDATE runs SET completed_at = ?, steps = ? WHERE run_id = ?", (time.time(), steps, self.run_id)
+            )
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+        print(f"🧾 Journal compactado ({steps} pasos de la corrida {self.run_id})")
+        if deferred:
+            print(f"   ⏭️ {deferred} tarjetas sin guardar quedan diferidas para el próximo scrape")
+        # El próximo paso (ej: siguiente ciclo del daemon) abre una corrida nueva
+        self.run_id = None
+        return deferred
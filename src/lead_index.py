@@ -0,0 +1,255 @@
+"""
+Índice local del tab Leads (espejo SQLite)
+Las etapas consultan aquí pendientes y duplicados; del Sheet solo se
+sincroniza el delta: filas nuevas y cambios de status.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from src.card_parser import normalize_inner_text, normalize_profile_url
+
+LEAD_INDEX_PATH = "./data/lead_index.sqlite"
+
+# Filas por request al refrescar filas puntuales con batchGet
+REFRESH_CHUNK = 100
+
+# Máximo de parámetros por consulta IN (...) de SQLite
+SEEN_CHUNK = 500
+
+
+def seen_keys(card):
+    """
+    Claves con las que se reconoce una tarjeta ya procesada: URL de perfil
+    normalizada y hash del texto (por si la tarjeta no trae link).
+    """
+    keys = []
+    url = normalize_profile_url(card.get("url", ""))
+    if url:
+        keys.append(f"url:{url}")
+    text = normalize_inner_text(card.get("text", ""))
+    if text:
+        keys.append(f"text:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}")
+    return keys
+
+
+class LeadIndex:
+
+    def __init__(self, spreadsheet_id, path=LEAD_INDEX_PATH):
+        """
+        Args:
+            spreadsheet_id: Sheet que espeja este índice
+            path: Archivo SQLite
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.spreadsheet_id = spreadsheet_id
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS leads ("
+            " row_num INTEGER PRIMARY KEY, lead_id TEXT, name TEXT, role TEXT,"
+            " company TEXT, profile_url TEXT, status TEXT, synced_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lead_id ON leads(lead_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Tarjetas ya procesadas: se saltan antes de cualquier llamada al modelo
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, seen_at REAL)")
+        self.conn.commit()
+
+        if self._get_meta("spreadsheet_id") != spreadsheet_id:
+            # Otro Sheet: las tarjetas vistas eran del anterior
+            self.conn.execute("DELETE FROM seen")
+            self.reset()
+        elif not self.conn.execute("SELECT 1 FROM seen LIMIT 1").fetchone():
+            # Índice creado antes de existir 'seen': se arma con las URLs ya conocidas
+            for (profile_url,) in self.conn.execute("SELECT profile_url FROM leads").fetchall():
+                self._add_seen_url(profile_url, time.time())
+            self.conn.commit()
+
+    # --- Metadatos ---
+
+    def _get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def last_row(self):
+        """Última fila del Sheet ya sincronizada (1 = solo encabezado)"""
+        return int(self._get_meta("last_row", 1))
+
+    def reset(self):
+        """
+        Vacía el índice; el próximo sync relee el tab completo.
+        Las tarjetas vistas se conservan: no dependen del orden de las filas.
+        """
+        with self.lock:
+            self.conn.execute("DELETE FROM leads")
+            self.conn.execute("DELETE FROM meta")
+            self._set_meta("spreadsheet_id", self.spreadsheet_id)
+            self._set_meta("last_row", 1)
+            self.conn.commit()
+
+    # --- Sincronización ---
+
+    def sync(self, sheets):
+        """
+        Trae al índice los cambios del Sheet.
+
+        1. Columnas A (lead_id) y L (status) de las filas conocidas, en un batchGet:
+           detectan filas movidas/borradas y leads devueltos a "Pendiente".
+        2. Filas completas solo para las filas nuevas y las que cambiaron.
+
+        Returns:
+            Número de filas nuevas incorporadas
+        """
+        with self.lock:
+            last_row = self.last_row
+
+            if last_row > 1:
+                columns = sheets.read_ranges([f"Leads!A2:A{last_row}", f"Leads!L2:L{last_row}"])
+                if columns is None:
+                    return 0
+                if not self._apply_status_delta(sheets, *columns):
+                    print("   🔄 El tab Leads cambió de forma: reconstruyendo índice")
+                    self.reset()
+                    last_row = 1
+
+            new_rows = sheets.read_range(f"Leads!A{last_row + 1}:L")
+            if new_rows is None:
+                return 0
+
+            now = time.time()
+            for offset, row in enumerate(new_rows):
+                self._upsert(last_row + 1 + offset, row, now)
+
+            self._set_meta("last_row", last_row + len(new_rows))
+            self._set_meta("last_synced", now)
+            self.conn.commit()
+            return len(new_rows)
+
+    def _apply_status_delta(self, sheets, ids_column, status_column):
+        """
+        Compara lead_id/status del Sheet con el índice y refresca lo que cambió.
+
+        Returns:
+            False si las filas ya no coinciden (hay que reconstruir)
+        """
+        known = {
+            row_num: (lead_id or "", status or "")
+            for row_num, lead_id, status in self.conn.execute(
+                "SELECT row_num, lead_id, status FROM leads"
+            )
+        }
+
+        to_refresh = []
+        for row_num in range(2, self.last_row + 1):
+            offset = row_num - 2
+            lead_id = ids_column[offset][0] if offset < len(ids_column) and ids_column[offset] else ""
+            status = status_column[offset][0] if offset < len(status_column) and status_column[offset] else ""
+
+            known_id, known_status = known.get(row_num, ("", ""))
+            if lead_id != known_id:
+                return False
+            if status != known_status:
+                to_refresh.append(row_num)
+
+        # Releer completas solo las filas cuyo status cambió (ej: BDR las devolvió a Pendiente)
+        now = time.time()
+        for start in range(0, len(to_refresh), REFRESH_CHUNK):
+            chunk = to_refresh[start:start + REFRESH_CHUNK]
+            rows = sheets.read_ranges([f"Leads!A{n}:L{n}" for n in chunk])
+            if rows is None:
+                continue
+            for row_num, values in zip(chunk, rows):
+                self._upsert(row_num, values[0] if values else [], now)
+
+        return True
+
+    def _upsert(self, row_num, row, synced_at):
+        cell = lambda i: row[i] if len(row) > i else ""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO leads"
+            " (row_num, lead_id, name, role, company, profile_url, status, synced_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (row_num, cell(0), cell(2), cell(3), cell(4), cell(10), cell(11), synced_at)
+        )
+        self._add_seen_url(cell(10), synced_at)
+
+    def _add_seen_url(self, profile_url, seen_at):
+        url = normalize_profile_url(profile_url)
+        if url:
+            self.conn.execute("INSERT OR IGNORE INTO seen (key, seen_at) VALUES (?, ?)", (f"url:{url}", seen_at))
+
+    # --- Consultas ---
+
+    def lead_ids(self):
+        """Set de lead_ids conocidos (para deduplicar en el scrape)"""
+        with self.lock:
+            return {r[0] for r in self.conn.execute("SELECT lead_id FROM leads WHERE lead_id != ''")}
+
+    def pending(self):
+        """
+        Leads con status "Pendiente", en orden de fila.
+
+        Returns:
+            Lista de dicts {row_num, lead_id, name, role, company, profile_url}
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT row_num, lead_id, name, role, company, profile_url FROM leads"
+                " WHERE status LIKE '%Pendiente%' ORDER BY row_num"
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, r)) for r in cursor]
+
+    def set_status(self, row_num, status):
+        """Refleja localmente un status que acabamos de escribir en el Sheet"""
+        with self.lock:
+            self.conn.execute("UPDATE leads SET status = ? WHERE row_num = ?", (status, row_num))
+            self.conn.commit()
+
+    # --- Tarjetas ya vistas ---
+
+    def split_seen(self, cards):
+        """
+        Separa las tarjetas nuevas de las ya procesadas (por URL o por texto),
+        incluidas las repetidas dentro del mismo grupo.
+
+        Returns:
+            Tuple: (tarjetas nuevas, tarjetas ya vistas)
+        """
+        card_keys = [seen_keys(card) for card in cards]
+        all_keys = list({key for keys in card_keys for key in keys})
+        known = set()
+        with self.lock:
+            for start in range(0, len(all_keys), SEEN_CHUNK):
+                chunk = all_keys[start:start + SEEN_CHUNK]
+                known.update(r[0] for r in self.conn.execute(
+                    f"SELECT key FROM seen WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ))
+
+        fresh, skipped = [], []
+        for card, keys in zip(cards, card_keys):
+            if any(key in known for key in keys):
+                skipped.append(card)
+            else:
+                fresh.append(card)
+                known.update(keys)
+        return fresh, skipped
+
+    def mark_seen(self, cards):
+        """Agrega tarjetas ya resueltas (guardadas o duplicadas) al set de vistas"""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen (key, seen_at) VALUES (?, ?)",
+                [(key, now) for card in cards for key in seen_keys(card)]
+            )
+            self.conn.commit()
@@ -0,0 +1,181 @@
+"""
+Instrumentación de llamadas externas por etapa
+Cuenta llamadas, latencias, bytes y errores de Serper, Gemini, Sheets,
+Gmail y LinkedIn, y deja un reporte JSON (y opcionalmente un textfile de
+Prometheus) al final de cada corrida.
+"""
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+RUNS_DIR = "./data/runs"
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class RunMetrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Empieza una corrida nueva (nuevo run_id y contadores en cero)"""
+        with self.lock:
+            self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+            self.started = time.time()
+            self.current_stage = "setup"
+            self.calls = {}     # (stage, provider, op) -> acumulados
+            self.stages = {}    # stage -> segundos
+            self.counters = {}  # contadores libres (ej: cache hits)
+
+    # --- Registro ---
+
+    @contextmanager
+    def stage(self, name):
+        """Marca la etapa en curso; las llamadas dentro se agrupan bajo ella"""
+        previous, self.current_stage = self.current_stage, name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            self.current_stage = previous
+
+    def staged(self, name):
+        """Decorador: ejecuta la función completa dentro de stage(name)"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def track(self, provider, op):
+        """
+        Mide una llamada externa.
+
+        El bloque puede completar el dict recibido:
+            call['bytes'] = tamaño de request + respuesta
+            call['error'] = True si la llamada falló sin lanzar excepción
+        Una excepción dentro del bloque cuenta como error y se relanza.
+        """
+        call = {"bytes": 0, "error": False}
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            call["error"] = True
+            raise
+        finally:
+            self._record(provider, op, time.perf_counter() - started, call["bytes"], call["error"])
+
+    def _record(self, provider, op, seconds, size, error):
+        key = (self.current_stage, provider, op)
+        with self.lock:
+            stats = self.calls.setdefault(key, {"count": 0, "errors": 0, "bytes": 0, "latencies": []})
+            stats["count"] += 1
+            stats["errors"] += int(bool(error))
+            stats["bytes"] += size or 0
+            stats["latencies"].append(seconds)
+
+    def incr(self, name, amount=1):
+        """Contador libre (ej: 'serper_cache_hits')"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # --- Reportes ---
+
+    def snapshot(self):
+        """Estado actual como dict serializable"""
+        with self.lock:
+            calls = []
+            for (stage, provider, op), stats in sorted(self.calls.items()):
+                latencies = stats["latencies"]
+                calls.append({
+                    "stage": stage,
+                    "provider": provider,
+                    "op": op,
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "bytes": stats["bytes"],
+                    "latency_total_s": round(sum(latencies), 4),
+                    "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+                    "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+                    "latency_max_ms": round(max(latencies) * 1000, 2) if latencies else 0,
+                })
+            return {
+                "run_id": self.run_id,
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "elapsed_s": round(time.time() - self.started, 3),
+                "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                "calls": calls,
+                "counters": dict(self.counters),
+            }
+
+    def write_report(self, path=None):
+        """
+        Escribe el reporte JSON de la corrida.
+
+        Returns:
+            Ruta del archivo escrito
+        """
+        path = path or os.path.join(RUNS_DIR, f"run-{self.run_id}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+        return path
+
+    def write_prometheus(self, path):
+        """Textfile para el collector de node_exporter (escritura atómica)"""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        labels = lambda c: {"stage": c["stage"], "provider": c["provider"], "op": c["op"]}
+        metric("meridian_api_calls_total", "counter", "Llamadas externas",
+               [(labels(c), c["count"]) for c in snap["calls"]])
+        metric("meridian_api_errors_total", "counter", "Llamadas externas fallidas",
+               [(labels(c), c["errors"]) for c in snap["calls"]])
+        metric("meridian_api_latency_seconds_sum", "counter", "Tiempo total en llamadas externas",
+               [(labels(c), c["latency_total_s"]) for c in snap["calls"]])
+        metric("meridian_api_bytes_total", "counter", "Bytes enviados y recibidos",
+               [(labels(c), c["bytes"]) for c in snap["calls"]])
+        metric("meridian_stage_duration_seconds", "gauge", "Duración de cada etapa",
+               [({"stage": name}, seconds) for name, seconds in snap["stages"].items()])
+        metric("meridian_counter", "gauge", "Contadores de la corrida",
+               [({"name": name}, value) for name, value in snap["counters"].items()])
+        metric("meridian_last_run_timestamp_seconds", "gauge", "Fin de la última corrida",
+               [({}, int(time.time()))])
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+
+# Una sola instancia por proceso: todos los clientes registran aquí
+metrics = RunMetrics()
@@ -0,0 +1,51 @@
+"""
+Normalización de nombres de empresa para agrupar leads
+"""
+
+import re
+import unicodedata
+
+# Sufijos legales (ya sin puntos) que no distinguen a una empresa de otra.
+# Ordenados de más largo a más corto para quitar primero los compuestos.
+LEGAL_SUFFIXES = [
+    "s de rl de cv", "sapi de cv", "sab de cv", "sa de cv",
+    "s en c", "s de rl", "de cv", "sapi", "sab", "sa", "sc",
+    "corporation", "company", "limited", "ltda", "corp", "inc", "llc",
+    "ltd", "gmbh", "sas", "srl", "spa", "plc", "co",
+]
+
+
+def strip_accents(text):
+    """Quita tildes y diacríticos ('Logística' -> 'Logistica')"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_company(name):
+    """
+    Normaliza un nombre de empresa para comparar entre leads.
+
+    'Grupo Bimbo, S.A.B. de C.V.' y 'GRUPO BIMBO' -> 'grupo bimbo'
+
+    Args:
+        name: Nombre tal como viene del Sheet
+
+    Returns:
+        String normalizado (vacío si no hay nombre)
+    """
+    text = strip_accents(name or "").lower()
+    # "s.a. de c.v." -> "sa de cv"; el resto de signos separa palabras
+    text = text.replace(".", "")
+    text = re.sub(r"[^a-z0-9&]+", " ", text)
+    text = " ".join(text.split())
+
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in LEGAL_SUFFIXES:
+            if text.endswith(" " + suffix):
+                text = text[:-len(suffix) - 1].strip()
+                stripped = True
+                break
+
+    return text
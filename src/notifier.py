@@ -6,62 +6,30 @@ Integrado con templates Sumadots y diseño SaaS.
 import os
 import base64
 from email.message import EmailMessage
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
-from src.templates import get_daily_summary_html
+from src.auth import get_service
+from src.metrics import metrics
 
 load_dotenv()
 
-SCOPES = [
-    'https://www.googleapis.com/auth/spreadsheets',
-    'https://www.googleapis.com/auth/gmail.send'
-]
-
 class EmailNotifier:
     
-    def __init__(self):
+    def __init__(self, service=None):
         self.bdr_email = os.getenv("BDR_EMAIL")
         self.sheet_url = os.getenv("GOOGLE_SHEET_URL", "")
-        self.creds = self._authenticate()
-        
-        if self.creds:
-            self.service = build('gmail', 'v1', credentials=self.creds)
-        else:
-            self.service = None
-            print("⚠️ No se pudo autenticar Gmail API")
-
-    def _authenticate(self):
-        """Autenticación unificada OAuth 2.0"""
-        creds = None
-        
-        if os.path.exists('token.json'):
-            try:
-                creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-            except Exception:
-                creds = None
         
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try: creds.refresh(Request())
-                except: creds = None
-            
-            if not creds:
-                if os.path.exists('credentials.json'):
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        'credentials.json', SCOPES)
-                    creds = flow.run_local_server(port=0)
-                else:
-                    print("❌ Error: No se encontró credentials.json")
-                    return None
-            
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-        
-        return creds
+        # Cliente ya construido (benchmarks); si no, el compartido de src.auth al primer envío
+        self._service = service
+    
+    @property
+    def service(self):
+        """Cliente de Gmail; credenciales y build() compartidos con Sheets"""
+        if self._service is None:
+            self._service = get_service('gmail', 'v1')
+            if self._service is None:
+                print("⚠️ No se pudo autenticar Gmail API")
+        return self._service
 
     def send_daily_summary(self, stats, top_leads):
         """Envía el email usando la API de Gmail y el template Premium"""
@@ -73,7 +41,8 @@ class EmailNotifier:
         # Logo de LinkedIn Sumadots
         logo_url = "https://media.licdn.com/dms/image/v2/C4E0BAQGkX9289qHnZA/company-logo_200_200/company-logo_200_200/0/1630646698687?e=2147483647&v=beta&t=H-W6i3GvU5x-r7qC9d_L2XvXyZ7_qYy_z2_x4_w5_v6"
         
-        # Generar HTML desde el módulo limpio
+        # Generar HTML desde el módulo limpio (se importa solo al enviar)
+        from src.templates import get_daily_summary_html
         html_content = get_daily_summary_html(stats, top_leads, self.sheet_url, logo_url)
 
         try:
@@ -87,7 +56,9 @@ class EmailNotifier:
             encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
             create_message = {'raw': encoded_message}
 
-            self.service.users().messages().send(userId="me", body=create_message).execute()
+            with metrics.track("gmail", "messages.send") as call:
+                self.service.users().messages().send(userId="me", body=create_message).execute()
+                call['bytes'] = len(encoded_message)
             print(f"✅ Notificación Sumadots enviada a {self.bdr_email}")
             return True
 
@@ -0,0 +1,90 @@
+"""
+Extracción local de nombre, cargo y empresa de una tarjeta de Sales Navigator
+Las tarjetas bien formadas no necesitan a Gemini: el markup trae los campos
+en elementos data-anonymize y el inner_text sigue un layout estable.
+"""
+
+import os
+import re
+
+# Confianza mínima para usar el resultado local en vez del modelo
+PARSER_MIN_CONFIDENCE = float(os.getenv("PARSER_MIN_CONFIDENCE", "0.75"))
+
+# Confianza por origen del campo
+DOM_CONFIDENCE = 1.0       # Elemento data-anonymize dedicado
+LAYOUT_CONFIDENCE = 0.8    # Línea "Cargo · Empresa" del inner_text
+
+# data-anonymize -> campo del lead
+FIELD_ATTRS = {
+    "person-name": "name",
+    "title": "role",
+    "company-name": "company",
+}
+FIELDS = ("name", "role", "company")
+
+# Un nombre de persona: 2 a 6 palabras, sin dígitos ni símbolos raros
+NAME_PATTERN = re.compile(r"^[^\W\d_][\w.'-]*(?: [^\W\d_][\w.'-]*){1,5}$")
+SEPARATOR = " · "
+
+
+def _clean(value):
+    return " ".join((value or "").split())
+
+
+def _looks_like_name(value):
+    return bool(NAME_PATTERN.match(value)) and not any(ch.isdigit() for ch in value)
+
+
+def parse_layout(text):
+    """
+    Lee el inner_text de la tarjeta:
+        Nombre
+        · 2º                  (grado de conexión, opcional)
+        Cargo · Empresa
+        Ubicación ...
+
+    Returns:
+        Dict con name, role, company (vacíos si el layout no calza)
+    """
+    lines = [_clean(line) for line in (text or "").splitlines()]
+    lines = [line for line in lines if line and not line.startswith("·")]
+    if len(lines) < 2:
+        return {}
+
+    role, sep, company = lines[1].partition(SEPARATOR)
+    if not sep:
+        return {}
+    return {"name": lines[0], "role": role.strip(), "company": company.strip()}
+
+
+def parse_profile(card):
+    """
+    Extrae los campos de una tarjeta scrapeada, sin llamar al modelo.
+
+    Args:
+        card: Dict del scraper {'text', 'url', 'fields'?}; 'fields' trae lo
+              leído de los elementos data-anonymize
+
+    Returns:
+        Tuple: (dict con name, role, company, confianza entre 0 y 1).
+        La confianza es la del campo más débil.
+    """
+    dom = {field: _clean(value) for field, value in (card.get("fields") or {}).items()}
+    layout = parse_layout(card.get("text"))
+
+    result = {}
+    confidence = DOM_CONFIDENCE
+    for field in FIELDS:
+        if dom.get(field):
+            result[field] = dom[field]
+        elif layout.get(field):
+            result[field] = layout[field]
+            confidence = min(confidence, LAYOUT_CONFIDENCE)
+        else:
+            result[field] = None
+            confidence = 0.0
+
+    if result["name"] and not _looks_like_name(result["name"]):
+        confidence = 0.0
+
+    return result, confidence
@@ -0,0 +1,327 @@
+"""
+Control de tasa por proveedor (Serper, Gemini, Sheets)
+Token bucket thread-safe cuya tasa se ajusta con AIMD: sube de a poco
+mientras las llamadas salen bien y se reduce a la mitad ante un 429/503.
+Además lleva la cuenta del uso diario contra la cuota configurada de cada
+proveedor y proyecta si una corrida la va a agotar.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Peticiones por minuto al arrancar (se sobreescriben con <PROVEEDOR>_RATE_PER_MIN)
+DEFAULT_RATES = {
+    "serper": 300,   # Serper tolera ráfagas altas
+    "gemini": 60,    # Conservador para gemini-2.0-flash
+    "sheets": 60,    # Cuota de Sheets API por usuario y minuto
+}
+
+# Techo hasta donde AIMD puede subir la tasa (<PROVEEDOR>_MAX_RATE_PER_MIN)
+DEFAULT_MAX_RATES = {
+    "serper": 1200,
+    "gemini": 600,   # Tiers pagos de Gemini admiten bastante más que 60/min
+    "sheets": 60,    # La cuota por usuario es fija: solo se baja ante 429
+}
+
+# Cuota diaria de llamadas (<PROVEEDOR>_DAILY_QUOTA); sin valor = sin tope diario
+DEFAULT_DAILY_QUOTAS = {
+    "serper": None,  # Ej: 2500 con los créditos del plan gratuito
+    "gemini": None,  # Ej: 1500 requests/día en el free tier de Flash
+    "sheets": None,
+}
+
+# Respuestas que indican que el proveedor nos está frenando
+THROTTLE_STATUSES = (429, 503)
+
+# Factor de reducción ante un 429/503 (el "multiplicative decrease")
+DECREASE_FACTOR = 0.5
+
+QUOTA_DB_PATH = "./data/quota.sqlite"
+
+
+class QuotaExhausted(RuntimeError):
+    """La cuota diaria configurada del proveedor ya se usó completa"""
+
+
+class TokenBucket:
+
+    def __init__(self, rate_per_min, burst=None):
+        """
+        Args:
+            rate_per_min: Peticiones sostenidas por minuto
+            burst: Máximo de peticiones seguidas sin esperar
+        """
+        self.rate = rate_per_min / 60.0
+        self.capacity = burst or max(1, int(self.rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _wait_time(self):
+        """Segundos hasta el próximo token (0 si hay uno); se llama con el lock tomado"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """
+        Bloquea hasta que haya un token disponible.
+
+        Returns:
+            Segundos esperados
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                wait = self._wait_time()
+                if not wait:
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+
+class QuotaTracker:
+    """
+    Uso diario por proveedor, persistido en SQLite para que lo compartan
+    corridas sucesivas (cron, daemon). Los incrementos se acumulan en memoria
+    y se escriben de a varios.
+    """
+
+    FLUSH_EVERY = 20
+
+    def __init__(self, path=QUOTA_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " day TEXT, provider TEXT, calls INTEGER, PRIMARY KEY (day, provider))"
+        )
+        self.conn.commit()
+        self._pending = {}   # (day, provider) -> llamadas aún no escritas
+
+    def add(self, provider, calls=1):
+        key = (date.today().isoformat(), provider)
+        with self.lock:
+            self._pending[key] = self._pending.get(key, 0) + calls
+            if sum(self._pending.values()) >= self.FLUSH_EVERY:
+                self._flush_locked()
+
+    def used_today(self, provider):
+        day = date.today().isoformat()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT calls FROM usage WHERE day = ? AND provider = ?", (day, provider)
+            ).fetchone()
+            return (row[0] if row else 0) + self._pending.get((day, provider), 0)
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        try:
+            self.conn.executemany(
+                "INSERT INTO usage (day, provider, calls) VALUES (?, ?, ?)"
+                " ON CONFLICT(day, provider) DO UPDATE SET calls = calls + excluded.calls",
+                [(day, provider, calls) for (day, provider), calls in self._pending.items()]
+            )
+            self.conn.commit()
+            self._pending = {}
+        except sqlite3.Error as e:
+            print(f"⚠️ No se pudo guardar el uso de cuota: {e}")
+
+
+class AdaptiveLimiter(TokenBucket):
+    """
+    Token bucket con tasa AIMD y cuota diaria.
+
+    Los clientes llaman acquire() antes de cada request y report(status)
+    con el resultado: cada respuesta OK suma 'increase' peticiones/min a la
+    tasa (hasta max_rate); cada 429/503 la multiplica por DECREASE_FACTOR
+    (hasta min_rate) y, si vino Retry-After, pausa al proveedor ese tiempo.
+    """
+
+    def __init__(self, provider, rate_per_min, burst=None, max_rate_per_min=None,
+                 daily_quota=None, tracker=None):
+        """
+        Args:
+            provider: Nombre para cuota y reportes ('serper', 'gemini', 'sheets')
+            rate_per_min: Tasa inicial
+            burst: Máximo de peticiones seguidas sin esperar
+            max_rate_per_min: Techo de la tasa (default: la inicial)
+            daily_quota: Llamadas permitidas por día (None = sin tope)
+            tracker: QuotaTracker donde se cuenta el uso
+        """
+        super().__init__(rate_per_min, burst)
+        self.provider = provider
+        self.max_rate = max(rate_per_min, max_rate_per_min or rate_per_min) / 60.0
+        self.min_rate = max(1.0, rate_per_min / 20) / 60.0
+        self.increase = max(1.0, self.max_rate * 60 / 200) / 60.0
+        self.daily_quota = daily_quota
+        self.tracker = tracker
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+    def acquire(self, cost=1):
+        """
+        Bloquea hasta que haya un token (y pasó cualquier Retry-After).
+
+        Args:
+            cost: Unidades de cuota que consume el request (ej: queries de
+                  un POST de lote a Serper); el rate limit sigue siendo por request
+
+        Raises:
+            QuotaExhausted si la cuota diaria no alcanza para el request
+
+        Returns:
+            Segundos esperados
+        """
+        if self.daily_quota and self.tracker and self.tracker.used_today(self.provider) + cost > self.daily_quota:
+            raise QuotaExhausted(f"Cuota diaria de {self.provider} agotada ({self.daily_quota} llamadas)")
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0:
+                    wait = self._wait_time()
+                if wait <= 0:
+                    break
+            time.sleep(wait)
+            waited += wait
+
+        self.charge(cost)
+        return waited
+
+    def charge(self, cost=1):
+        """Suma uso a la cuota diaria sin esperar token (ej: reintentos internos de urllib3)"""
+        if self.tracker and cost:
+            self.tracker.add(self.provider, cost)
+
+    def report(self, status, retry_after=None):
+        """
+        Ajusta la tasa según la respuesta del proveedor.
+
+        Args:
+            status: Código HTTP (o equivalente) de la llamada; None si no hubo respuesta
+            retry_after: Segundos indicados por el proveedor, si los hay
+        """
+        with self.lock:
+            self._refill()
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + float(retry_after))
+            elif status is not None and status < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    @property
+    def rate_per_min(self):
+        return self.rate * 60
+
+    def projection(self, planned_calls):
+        """
+        Proyección de una corrida que hará ~planned_calls llamadas.
+
+        Returns:
+            Dict con used, quota, remaining (None sin cuota), planned,
+            exhausts (True si la corrida no alcanza) y minutes (a la tasa actual)
+        """
+        used = self.tracker.used_today(self.provider) if self.tracker else 0
+        remaining = max(0, self.daily_quota - used) if self.daily_quota else None
+        return {
+            "provider": self.provider,
+            "used": used,
+            "quota": self.daily_quota,
+            "remaining": remaining,
+            "planned": planned_calls,
+            "exhausts": remaining is not None and planned_calls > remaining,
+            "minutes": planned_calls / self.rate_per_min if self.rate_per_min else None,
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_tracker = None
+
+
+def _env_number(name, default, cast=float):
+    value = os.getenv(name)
+    return cast(value) if value else default
+
+
+def get_tracker():
+    """QuotaTracker compartido del proceso (QUOTA_DB_PATH=':memory:' para no persistir)"""
+    global _tracker
+    with _limiters_lock:
+        if _tracker is None:
+            _tracker = QuotaTracker(os.getenv("QUOTA_DB_PATH", QUOTA_DB_PATH))
+            atexit.register(_tracker.flush)
+        return _tracker
+
+
+def get_limiter(provider):
+    """
+    Devuelve el limiter compartido del proveedor (uno por proceso).
+
+    Args:
+        provider: 'serper', 'gemini' o 'sheets'
+    """
+    tracker = get_tracker()
+    with _limiters_lock:
+        if provider not in _limiters:
+            prefix = provider.upper()
+            rate = _env_number(f"{prefix}_RATE_PER_MIN", DEFAULT_RATES[provider])
+            _limiters[provider] = AdaptiveLimiter(
+                provider,
+                rate,
+                burst=_env_number(f"{prefix}_BURST", None, int),
+                max_rate_per_min=_env_number(f"{prefix}_MAX_RATE_PER_MIN", DEFAULT_MAX_RATES[provider]),
+                daily_quota=_env_number(f"{prefix}_DAILY_QUOTA", DEFAULT_DAILY_QUOTAS[provider], int),
+                tracker=tracker,
+            )
+        return _limiters[provider]
+
+
+def quota_report(planned):
+    """
+    Imprime, antes de una corrida, el uso de cuota proyectado por proveedor.
+
+    Args:
+        planned: Dict {proveedor: llamadas estimadas de la corrida}
+
+    Returns:
+        Lista de proyecciones (ver AdaptiveLimiter.projection)
+    """
+    projections = []
+    for provider, calls in planned.items():
+        p = get_limiter(provider).projection(calls)
+        projections.append(p)
+        eta = f", ~{p['minutes']:.1f} min a {get_limiter(provider).rate_per_min:.0f}/min" if p['minutes'] else ""
+        if p["quota"] is None:
+            print(f"   📈 {provider}: ~{calls} llamadas{eta} (hoy: {p['used']}, sin cuota diaria)")
+        elif p["exhausts"]:
+            print(f"   ⚠️ {provider}: ~{calls} llamadas pero quedan {p['remaining']}/{p['quota']} hoy;"
+                  f" la cuota se agotaría a mitad de corrida")
+        else:
+            print(f"   📈 {provider}: ~{calls} llamadas{eta}; quedan {p['remaining'] - calls}/{p['quota']} después")
+    return projections
@@ -4,17 +4,85 @@ Busca información de importaciones y datos comerciales
 """
 
 import os
+import json
+import asyncio
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from src.ratelimit import QuotaExhausted, get_limiter
+from src.cache import CACHE_DIR, SQLiteCache, make_key, normalize_query
+from src.metrics import metrics
 
 load_dotenv()
 
+# Máximo de búsquedas por request en el endpoint de lote de Serper
+SERPER_BATCH_LIMIT = 100
+
+# Reintentos ante rate limit y errores del servidor (respeta Retry-After)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Tope global de búsquedas en vuelo, compartido por todos los leads y workers
+# (mantenerlo <= SERPER_POOL_SIZE para no abrir conexiones extra)
+SERPER_MAX_CONCURRENCY = int(os.getenv("SERPER_MAX_CONCURRENCY", "8"))
+_search_slots = threading.BoundedSemaphore(SERPER_MAX_CONCURRENCY)
+
+
+def build_session(pool_size=None, max_retries=None):
+    """
+    Sesión HTTP con keep-alive para Serper: reutiliza conexiones TCP+TLS
+    entre búsquedas en vez de abrir una por request.
+    
+    Args:
+        pool_size: Conexiones máximas en el pool (>= workers de research)
+        max_retries: Reintentos ante 429/5xx, con backoff exponencial
+    
+    Returns:
+        requests.Session configurada
+    """
+    pool_size = pool_size or int(os.getenv("SERPER_POOL_SIZE", "10"))
+    if max_retries is None:
+        max_retries = int(os.getenv("SERPER_MAX_RETRIES", "3"))
+    
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=float(os.getenv("SERPER_RETRY_BACKOFF", "0.5")),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"POST"}),   # Serper solo usa POST (búsquedas idempotentes)
+        respect_retry_after_header=True,
+        raise_on_status=False                  # Tras agotar reintentos, devolver la última respuesta
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
 
 class CompanyResearcherAPI:
     
-    def __init__(self):
+    def __init__(self, session=None):
+        """
+        Args:
+            session: Objeto con .post() compatible con requests (benchmarks).
+                     Por defecto, una sesión con pool de conexiones (build_session)
+        """
         self.api_key = os.getenv("SERPER_API_KEY")
+        self.session = session or build_session()
         self.base_url = "https://google.serper.dev/search"
+        self.limiter = get_limiter("serper")
+        # Hilos para las queries de un lead; se crean una vez y se reutilizan
+        self._query_pool = ThreadPoolExecutor(max_workers=SERPER_MAX_CONCURRENCY, thread_name_prefix="serper")
+        
+        # Caché de respuestas: muchos leads comparten empresa y queries
+        ttl_hours = float(os.getenv("SERPER_CACHE_TTL_HOURS", "168"))
+        self.cache = SQLiteCache(
+            os.path.join(CACHE_DIR, "serper.sqlite"),
+            ttl_seconds=ttl_hours * 3600,
+            max_entries=int(os.getenv("SERPER_CACHE_MAX_ENTRIES", "5000"))
+        )
         
         if not self.api_key:
             print("⚠️ ADVERTENCIA: No se encontró SERPER_API_KEY en .env")
@@ -35,80 +103,305 @@ class CompanyResearcherAPI:
         if not self.api_key:
             return "Error: API key no configurada", []
         
-        # Parsear queries del template
-        queries = [
+        queries = self._build_queries(company_name, query_templates)
+        
+        responses = []
+        for query in queries:
+            print(f"      🔎 {query}")
+            responses.append(self._search(query))
+        
+        return self._merge_responses(responses)
+    
+    def search_import_data_parallel(self, company_name, query_templates):
+        """
+        Igual que search_import_data, pero lanza todas las queries del lead a la vez.
+        
+        Las respuestas se combinan en el orden de las queries, así que el
+        resultado es idéntico al de la versión secuencial.
+        
+        Returns:
+            Tuple: (info_text, urls_list)
+        """
+        if not self.api_key:
+            return "Error: API key no configurada", []
+        
+        queries = self._build_queries(company_name, query_templates)
+        for query in queries:
+            print(f"      🔎 {query}")
+        
+        return self._merge_responses(list(self._query_pool.map(self._search_limited, queries)))
+    
+    async def search_import_data_async(self, company_name, query_templates):
+        """
+        Versión awaitable de search_import_data_parallel, para llamar desde
+        un event loop: las queries corren en el mismo pool de hilos.
+        
+        Returns:
+            Tuple: (info_text, urls_list)
+        """
+        if not self.api_key:
+            return "Error: API key no configurada", []
+        
+        queries = self._build_queries(company_name, query_templates)
+        for query in queries:
+            print(f"      🔎 {query}")
+        
+        responses = await asyncio.gather(
+            *(asyncio.wrap_future(self._query_pool.submit(self._search_limited, query)) for query in queries)
+        )
+        return self._merge_responses(responses)
+    
+    async def search_many_async(self, company_names, query_templates):
+        """
+        Investiga varias empresas concurrentemente (todas sus queries en paralelo,
+        bajo el mismo tope global).
+        
+        Returns:
+            Lista de tuples (info_text, urls_list) en el orden de company_names
+        """
+        return await asyncio.gather(
+            *(self.search_import_data_async(name, query_templates) for name in company_names)
+        )
+    
+    def _build_queries(self, company_name, query_templates):
+        """Parsea las queries del template (separadas por coma)"""
+        return [
             q.strip().replace("{company}", company_name) 
             for q in query_templates.split(",")
             if q.strip()
         ]
-        
+    
+    def _merge_responses(self, responses):
+        """Combina respuestas en orden, sin URLs repetidas"""
         all_results = []
         all_urls = []
         
+        for data in responses:
+            if data:
+                self._collect_results(data, all_results, all_urls)
+        
+        # Preparar resultados
+        info_text = " | ".join(all_results) if all_results else "Sin información encontrada"
+        
+        return info_text, all_urls
+    
+    def _search_limited(self, query):
+        """_search bajo el tope global de concurrencia"""
+        with _search_slots:
+            return self._search(query)
+    
+    def _search(self, query, gl="mx", hl="es", num=5):
+        """
+        Ejecuta una búsqueda en Serper, pasando primero por la caché.
+        
+        Returns:
+            Dict con la respuesta JSON de Serper o None si falló
+        """
+        payload = self._payload(query, gl, hl, num)
+        key = self._payload_key(payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        data = self._post(payload, "search", timeout=10)
+        if data is not None:
+            self.cache.set(key, data)
+        return data
+    
+    @staticmethod
+    def _payload(query, gl="mx", hl="es", num=5):
+        return {
+            "q": query,
+            "gl": gl,        # México
+            "hl": hl,        # Español
+            "num": num       # Top 5 resultados
+        }
+    
+    @staticmethod
+    def _payload_key(payload):
+        """Clave de caché: la query normalizada más los parámetros de búsqueda"""
+        return make_key(normalize_query(payload["q"]), payload["gl"], payload["hl"], payload["num"])
+    
+    def search_import_data_batch(self, company_names, query_templates, batch_size=None):
+        """
+        Investiga muchas empresas empaquetando sus queries en requests de lote.
+        
+        Serper acepta un array de búsquedas en un solo POST y responde un array
+        alineado. Las queries ya cacheadas (o repetidas entre empresas) no se
+        envían; las que el lote no devuelve bien se reintentan una por una.
+        
+        Args:
+            company_names: Empresas a investigar
+            query_templates: String con queries separadas por coma ({company})
+            batch_size: Queries por request (tope SERPER_BATCH_LIMIT)
+        
+        Returns:
+            Lista de tuples (info_text, urls_list) en el orden de company_names,
+            idénticas a las de search_import_data
+        """
+        if not self.api_key:
+            return [("Error: API key no configurada", []) for _ in company_names]
+        
+        batch_size = min(batch_size or int(os.getenv("SERPER_BATCH_SIZE", str(SERPER_BATCH_LIMIT))), SERPER_BATCH_LIMIT)
+        per_company = [self._build_queries(name, query_templates) for name in company_names]
+        
+        # Resolver primero desde caché; lo demás se junta sin repetidos
+        responses = {}
+        misses = {}
+        for queries in per_company:
+            for query in queries:
+                key = self._payload_key(self._payload(query))
+                if key in responses or key in misses:
+                    continue
+                cached = self.cache.get(key)
+                if cached is not None:
+                    responses[key] = cached
+                else:
+                    misses[key] = query
+        
+        pending = list(misses.items())
+        if pending:
+            print(f"      🔎 {len(pending)} búsquedas en {-(-len(pending) // batch_size)} requests de lote")
+        
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            payload = [self._payload(query) for _, query in chunk]
+            
+            data = self._post(payload, "search_batch", timeout=30)
+            if not isinstance(data, list) or len(data) != len(chunk):
+                data = [None] * len(chunk)
+            
+            for (key, query), result in zip(chunk, data):
+                if isinstance(result, dict):
+                    self.cache.set(key, result)
+                    responses[key] = result
+                else:
+                    # Fallback individual para lo que el lote no devolvió
+                    responses[key] = self._search(query)
+        
+        return [
+            self._merge_responses([
+                responses.get(self._payload_key(self._payload(query))) for query in queries
+            ])
+            for queries in per_company
+        ]
+    
+    def _post(self, payload, op, timeout):
+        """
+        POST a Serper con rate limit e instrumentación.
+        
+        Returns:
+            JSON de la respuesta o None si falló
+        """
         headers = {
             "X-API-KEY": self.api_key,
             "Content-Type": "application/json"
         }
         
-        for query in queries:
-            print(f"      🔎 {query}")
-            
-            try:
-                response = requests.post(
+        try:
+            # Serper cobra por query: un POST de lote consume una unidad por entrada
+            cost = len(payload) if isinstance(payload, list) else 1
+            self.limiter.acquire(cost)
+            with metrics.track("serper", op) as call:
+                response = self.session.post(
                     self.base_url,
                     headers=headers,
-                    json={
-                        "q": query,
-                        "gl": "mx",      # México
-                        "hl": "es",      # Español
-                        "num": 5         # Top 5 resultados
-                    },
-                    timeout=10
+                    json=payload,
+                    timeout=timeout
                 )
+                call['bytes'] = len(json.dumps(payload)) + len(getattr(response, 'content', b'') or b'')
+                call['error'] = response.status_code != 200
+            self._report(response, cost)
+            
+            if response.status_code != 200:
+                print(f"      ⚠️ Error HTTP: {response.status_code}")
+                return None
+            
+            return response.json()
                 
-                if response.status_code != 200:
-                    print(f"      ⚠️ Error HTTP: {response.status_code}")
-                    continue
-                
-                data = response.json()
-                
-                # Extraer resultados orgánicos
-                organic = data.get("organic", [])
-                
-                for r in organic[:3]:  # Top 3 por query
-                    title = r.get("title", "")
-                    snippet = r.get("snippet", "")
-                    url = r.get("link", "")
-                    
-                    if title and snippet:
-                        result = f"{title}: {snippet}"
-                        all_results.append(result)
-                        
-                        if url and url not in all_urls:
-                            all_urls.append(url)
-                
-                # También extraer Knowledge Graph si existe
-                knowledge = data.get("knowledgeGraph", {})
-                if knowledge:
-                    kg_title = knowledge.get("title", "")
-                    kg_desc = knowledge.get("description", "")
-                    kg_url = knowledge.get("website", "")
-                    
-                    if kg_title and kg_desc:
-                        all_results.append(f"[Info] {kg_title}: {kg_desc}")
-                    
-                    if kg_url and kg_url not in all_urls:
-                        all_urls.append(kg_url)
-                        
-            except requests.exceptions.Timeout:
-                print(f"      ⚠️ Timeout en búsqueda")
-            except Exception as e:
-                print(f"      ❌ Error: {e}")
+        except QuotaExhausted:
+            raise
+        except requests.exceptions.Timeout:
+            print(f"      ⚠️ Timeout en búsqueda")
+        except Exception as e:
+            print(f"      ❌ Error: {e}")
+        return None
+    
+    def _report(self, response, cost=1):
+        """
+        Informa al limiter cómo respondió Serper, incluidos los 429/503 que
+        urllib3 ya reintentó por su cuenta dentro de session.post (cada
+        reintento vuelve a consumir cuota).
+        """
+        retries = getattr(getattr(response, 'raw', None), 'retries', None)
+        for attempt in getattr(retries, 'history', None) or ():
+            self.limiter.report(attempt.status)
+            self.limiter.charge(cost)
         
-        # Preparar resultados
-        info_text = " | ".join(all_results) if all_results else "Sin información encontrada"
+        retry_after = (getattr(response, 'headers', None) or {}).get('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None  # Formato fecha HTTP: alcanza con el backoff de AIMD
+        self.limiter.report(response.status_code, retry_after)
+    
+    def connections_opened(self):
+        """
+        Conexiones (handshakes TCP+TLS) abiertas por el pool de la sesión.
         
-        return info_text, all_urls
+        Returns:
+            int, o None si la sesión no expone un pool (ej: dobles de benchmark)
+        """
+        adapters = getattr(self.session, "adapters", None)
+        if not adapters:
+            return None
+        
+        opened = 0
+        for adapter in adapters.values():
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                pool = pools.get(key)
+                opened += getattr(pool, "num_connections", 0) if pool else 0
+        return opened
+    
+    def stats_line(self):
+        """Resumen de conexiones para el log de la corrida"""
+        opened = self.connections_opened()
+        if opened is None:
+            return "   🔌 Serper: sesión sin pool de conexiones"
+        return f"   🔌 Serper: {opened} conexiones abiertas (keep-alive)"
+    
+    def _collect_results(self, data, all_results, all_urls):
+        """Agrega resultados orgánicos y Knowledge Graph de una respuesta"""
+        # Extraer resultados orgánicos
+        organic = data.get("organic", [])
+        
+        for r in organic[:3]:  # Top 3 por query
+            title = r.get("title", "")
+            snippet = r.get("snippet", "")
+            url = r.get("link", "")
+            
+            if title and snippet:
+                result = f"{title}: {snippet}"
+                all_results.append(result)
+                
+                if url and url not in all_urls:
+                    all_urls.append(url)
+        
+        # También extraer Knowledge Graph si existe
+        knowledge = data.get("knowledgeGraph", {})
+        if knowledge:
+            kg_title = knowledge.get("title", "")
+            kg_desc = knowledge.get("description", "")
+            kg_url = knowledge.get("website", "")
+            
+            if kg_title and kg_desc:
+                all_results.append(f"[Info] {kg_title}: {kg_desc}")
+            
+            if kg_url and kg_url not in all_urls:
+                all_urls.append(kg_url)
     
     def search_company_details(self, company_name):
         """
@@ -2,15 +2,85 @@
 Scraper de Sales Navigator con medidas anti-detección
 """
 
+import os
+import queue
 import random
+import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from playwright.sync_api import sync_playwright
 # REVERTIDO: Usamos la clase Stealth tal como la tenías originalmente
 from playwright_stealth import Stealth
+from src.metrics import metrics
+from src.card_parser import MIN_TEXT_LENGTH, clean_profile_url, normalize_inner_text, normalize_profile_url
+from src.profile_parser import FIELD_ATTRS
+from src.snapshots import SnapshotWriter
+
+# Selectores de tarjeta y de link, en orden de preferencia
+CARD_SELECTORS = ['.artdeco-entity-lockup', '[data-x--lead-card]']
+LINK_SELECTORS = [
+    'a[data-control-name="view_lead_panel_via_search_result"]',
+    '.artdeco-entity-lockup__title a',
+]
+
+# Extracción de todas las tarjetas en un solo viaje al navegador:
+# el primer selector de tarjeta con resultados gana (mismo fallback de siempre).
+# También trae nombre/cargo/empresa de los elementos data-anonymize.
+EXTRACT_CARDS_JS = """
+([cardSelectors, linkSelectors, fieldAttrs]) => {
+    for (const selector of cardSelectors) {
+        const cards = document.querySelectorAll(selector);
+        if (cards.length === 0) continue;
+        return Array.from(cards, card => {
+            let href = "";
+            for (const linkSelector of linkSelectors) {
+                const link = card.querySelector(linkSelector);
+                if (link) { href = link.getAttribute("href") || ""; break; }
+            }
+            const fields = {};
+            for (const [attr, field] of Object.entries(fieldAttrs)) {
+                const el = card.querySelector(`[data-anonymize="${attr}"]`);
+                if (el && el.innerText.trim()) fields[field] = el.innerText.trim();
+            }
+            return {text: card.innerText || "", href: href, fields: fields};
+        });
+    }
+    return [];
+}
+"""
+
+# Contextos de navegador abiertos a la vez cuando hay varias búsquedas (shards)
+SCRAPER_MAX_CONTEXTS = int(os.getenv("SCRAPER_MAX_CONTEXTS", "2"))
+
+# Archivos de bloqueo de Chromium que no se copian al clonar la sesión
+PROFILE_LOCK_FILES = ("Singleton*", "lockfile", "*.lock")
+
+
+def clone_session(base_dir, target_dir):
+    """
+    Copia el perfil de Chromium con la sesión de LinkedIn para un shard.
+
+    Dos contextos persistentes no pueden compartir user_data_dir; se vuelve a
+    copiar solo si la sesión base cambió (ej: login nuevo) desde la última copia.
+    """
+    base_cookies = os.path.join(base_dir, "Default", "Cookies")
+    target_cookies = os.path.join(target_dir, "Default", "Cookies")
+    if os.path.exists(target_dir):
+        if not os.path.exists(base_cookies) or (
+            os.path.exists(target_cookies) and os.path.getmtime(target_cookies) >= os.path.getmtime(base_cookies)
+        ):
+            return target_dir
+        shutil.rmtree(target_dir)
+    if os.path.exists(base_dir):
+        shutil.copytree(base_dir, target_dir, ignore=shutil.ignore_patterns(*PROFILE_LOCK_FILES))
+    return target_dir
+
 
 class MeridianScraper:
     
     # Configuración de seguridad anti-ban
+    # (no pasa por src.ratelimit: estas esperas imitan a una persona, no una cuota)
     SAFE_CONFIG = {
         "min_wait_page": 8,      # Segundos mínimos entre páginas
         "max_wait_page": 15,     # Segundos máximos entre páginas
@@ -19,8 +89,15 @@ class MeridianScraper:
         "typing_delay": (50, 150),  # Delay al escribir (ms)
     }
     
-    def __init__(self, user_data_dir="./data/browser_session"):
+    def __init__(self, user_data_dir="./data/browser_session", snapshot_path=None):
+        """
+        Args:
+            user_data_dir: Perfil persistente de Chromium (sesión de LinkedIn)
+            snapshot_path: Si se indica, guarda cada página visitada (HTML +
+                           tarjetas) en este .jsonl.gz para reproducirla offline
+        """
         self.user_data_dir = user_data_dir
+        self.snapshot_path = snapshot_path
 
     def _human_delay(self, min_sec=1, max_sec=3):
         """Pausa aleatoria para simular comportamiento humano"""
@@ -40,14 +117,110 @@ class MeridianScraper:
     def get_profiles(self, search_url, max_pages=3):
         """
         Extrae perfiles de Sales Navigator.
+        
+        Args:
+            search_url: URL de búsqueda, o lista de URLs (una por shard)
+        
         Returns: Lista de diccionarios {'text': str, 'url': str}
         """
         all_results = []
+        for page_results in self.iter_pages(search_url, max_pages):
+            all_results.extend(page_results)
+        
+        print(f"\n✅ Total perfiles extraídos: {len(all_results)}")
+        return all_results
+
+    def iter_pages(self, search_url, max_pages=3):
+        """
+        Generador: entrega los perfiles página por página apenas se extraen.
         
+        Con una sola URL todo corre en el hilo del consumidor, que debe ser
+        único (API síncrona de Playwright). Con varias, cada búsqueda es un
+        shard con su propio hilo, contexto y perfil de Chromium (hasta
+        SCRAPER_MAX_CONTEXTS a la vez), y las tarjetas repetidas entre
+        búsquedas se descartan por URL de perfil.
+        Si el consumidor deja de iterar, los navegadores se cierran igual.
+        
+        Yields: Lista de diccionarios {'text': str, 'url': str} por página
+        """
+        search_urls = [search_url] if isinstance(search_url, str) else list(search_url)
+        snapshots = SnapshotWriter(self.snapshot_path) if self.snapshot_path else None
+        try:
+            if len(search_urls) == 1:
+                yield from self._iter_shard(search_urls[0], max_pages, self.user_data_dir, snapshots)
+            else:
+                yield from self._iter_shards(search_urls, max_pages, snapshots)
+        finally:
+            if snapshots:
+                snapshots.close()
+                print(f"🎞️ {snapshots.pages} páginas guardadas en {self.snapshot_path}")
+
+    def _iter_shards(self, search_urls, max_pages, snapshots):
+        """Corre una búsqueda por shard en paralelo y mezcla las páginas sin perfiles repetidos"""
+        pages = queue.Queue()
+        stop = threading.Event()
+        total = len(search_urls)
+        
+        # El shard 1 usa la sesión original; el resto, una copia propia.
+        # Se copian acá, antes de que ningún Chromium abra (y escriba) el perfil base
+        user_data_dirs = [self.user_data_dir]
+        for index in range(1, total):
+            try:
+                user_data_dirs.append(clone_session(self.user_data_dir, f"{self.user_data_dir}_shard{index + 1}"))
+            except OSError as e:   # shutil.Error incluido
+                print(f"❌ [{index + 1}/{total}] No se pudo copiar la sesión, se omite la búsqueda: {e}")
+                user_data_dirs.append(None)
+        
+        def run_shard(index, url):
+            label = f"[{index + 1}/{total}] "
+            shard = self._iter_shard(url, max_pages, user_data_dirs[index], snapshots, label)
+            try:
+                for page_results in shard:
+                    if stop.is_set(): break
+                    pages.put(page_results)
+            finally:
+                shard.close()
+        
+        workers = max(1, min(SCRAPER_MAX_CONTEXTS, total))
+        print(f"🧩 {total} búsquedas en {workers} contextos paralelos")
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+        running = {
+            pool.submit(run_shard, i, url): i for i, url in enumerate(search_urls) if user_data_dirs[i]
+        }
+        
+        seen, duplicates = set(), 0
+        try:
+            while True:
+                try:
+                    page_results = pages.get(timeout=1)
+                except queue.Empty:
+                    if all(f.done() for f in running) and pages.empty(): break
+                    continue
+                
+                unique = []
+                for card in page_results:
+                    # La URL cruda trae sufijos propios de cada búsqueda (',NAME_SEARCH,...')
+                    key = normalize_profile_url(card["url"]) or normalize_inner_text(card["text"])
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                    unique.append(card)
+                if unique: yield unique
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            for future, index in running.items():
+                if future.done() and not future.cancelled() and future.exception():
+                    print(f"❌ [{index + 1}/{total}] Búsqueda abortada: {future.exception()}")
+            if duplicates: print(f"🔁 {duplicates} perfiles repetidos entre búsquedas descartados")
+
+    def _iter_shard(self, search_url, max_pages, user_data_dir, snapshots=None, label=""):
+        """Recorre las páginas de una búsqueda en un contexto persistente propio"""
         with sync_playwright() as p:
             # Iniciar navegador persistente
             context = p.chromium.launch_persistent_context(
-                self.user_data_dir,
+                user_data_dir,
                 headless=False,
                 args=[
                     "--disable-blink-features=AutomationControlled",
@@ -77,10 +250,12 @@ class MeridianScraper:
                         separator = "&" if "?" in search_url else "?"
                         current_url = f"{search_url}{separator}page={page_num}"
                     
-                    print(f"\n🕵️ Página {page_num}/{max_pages}")
+                    print(f"\n🕵️ {label}Página {page_num}/{max_pages}")
                     
                     # Navegar
-                    page.goto(current_url, wait_until="domcontentloaded")
+                    with metrics.track("linkedin", "page_load") as call:
+                        response = page.goto(current_url, wait_until="domcontentloaded")
+                        call['error'] = response is not None and not response.ok
                     
                     # Espera inicial
                     if page_num == 1:
@@ -97,44 +272,29 @@ class MeridianScraper:
                     print("   📜 Scrolling...")
                     self._human_scroll(page)
                     
-                    # Extraer perfiles
-                    profile_cards = page.query_selector_all('.artdeco-entity-lockup')
-                    
-                    if len(profile_cards) == 0:
-                        profile_cards = page.query_selector_all('[data-x--lead-card]')
+                    # Extraer perfiles (un solo page.evaluate para todas las tarjetas)
+                    started = time.perf_counter()
+                    with metrics.track("linkedin", "extract_cards"):
+                        raw_cards = page.evaluate(EXTRACT_CARDS_JS, [CARD_SELECTORS, LINK_SELECTORS, FIELD_ATTRS])
+                    parse_ms = (time.perf_counter() - started) * 1000
                     
-                    if len(profile_cards) == 0:
-                        print("   ⚠️ No se encontraron perfiles. Posible fin.")
+                    if len(raw_cards) == 0:
+                        print(f"   ⚠️ {label}No se encontraron perfiles. Posible fin.")
                         break
                     
-                    print(f"   📦 Perfiles encontrados: {len(profile_cards)}")
+                    print(f"   📦 {label}Perfiles encontrados: {len(raw_cards)} (extracción {parse_ms:.0f} ms)")
                     
-                    for card in profile_cards:
-                        try:
-                            # Texto completo para análisis
-                            text = card.inner_text()
-                            
-                            # Extraer Link del perfil
-                            # Buscamos el enlace principal del nombre
-                            link_el = card.query_selector('a[data-control-name="view_lead_panel_via_search_result"]')
-                            if not link_el:
-                                link_el = card.query_selector('.artdeco-entity-lockup__title a')
-                            
-                            profile_url = ""
-                            if link_el:
-                                href = link_el.get_attribute('href')
-                                if href:
-                                    # Limpiamos query params para dejar la URL limpia
-                                    profile_url = f"https://www.linkedin.com{href.split('?')[0]}"
-
-                            if text and len(text) > 20:
-                                # Devolvemos diccionario con texto Y url
-                                all_results.append({
-                                    "text": text,
-                                    "url": profile_url
-                                })
-                        except:
-                            continue
+                    # Devolvemos diccionario con texto Y url (sin query params)
+                    page_results = [
+                        {"text": card["text"], "url": clean_profile_url(card["href"]), "fields": card["fields"]}
+                        for card in raw_cards
+                        if card["text"] and len(card["text"]) > MIN_TEXT_LENGTH
+                    ]
+                    
+                    if snapshots:
+                        snapshots.write(current_url, page_num, page.content(), page_results)
+                    
+                    yield page_results
                     
                     # Pausa entre páginas
                     if page_num < max_pages:
@@ -145,10 +305,7 @@ class MeridianScraper:
                         print(f"   😴 Pausa de {delay:.1f}s...")
                         
             except Exception as e:
-                print(f"❌ Error durante scraping: {e}")
+                print(f"❌ {label}Error durante scraping: {e}")
                 
             finally:
-                context.close()
-        
-        print(f"\n✅ Total perfiles extraídos: {len(all_results)}")
-        return all_results
\ No newline at end of file
+                context.close()
\ No newline at end of file
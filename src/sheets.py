@@ -2,42 +2,90 @@
 Interface con Google Sheets para Meridian-BDR
 """
 
+import os
 import os.path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import json
+import re
+import threading
+import time
 from googleapiclient.errors import HttpError
+from src.auth import get_service
+from src.ratelimit import get_limiter
+from src.metrics import metrics
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+# Sheets acepta requests de hasta ~10MB; nos quedamos muy por debajo
+APPEND_MAX_BYTES = 1_000_000
+
+
+def range_rows(a1_range):
+    """
+    Números de fila cubiertos por un rango A1.
+    
+    'Leads!A12:M14' -> [12, 13, 14]
+    """
+    match = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$", a1_range or "")
+    if not match:
+        return []
+    start = int(match.group(1))
+    end = int(match.group(2) or start)
+    return list(range(start, end + 1))
 
 
 class SheetsInterface:
     
-    def __init__(self, spreadsheet_id):
+    def __init__(self, spreadsheet_id, service=None):
+        """
+        Args:
+            spreadsheet_id: ID del Google Sheet
+            service: Cliente de Sheets ya construido (benchmarks); si no, se autentica
+        """
         self.spreadsheet_id = spreadsheet_id
-        self.creds = self._authenticate()
-        self.service = build('sheets', 'v4', credentials=self.creds)
-
-    def _authenticate(self):
-        """Autentica con Google Sheets API"""
-        creds = None
-        
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    'credentials.json', SCOPES)
-                creds = flow.run_local_server(port=0)
-            
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
+        # Autenticación y build() se difieren hasta la primera llamada
+        self._service = service
+        self._service_lock = threading.Lock()
+        self.limiter = get_limiter("sheets")
+        
+        # Buffer de escrituras para enviarlas juntas con values.batchUpdate
+        self.flush_rows = int(os.getenv("SHEETS_FLUSH_ROWS", "50"))
+        self.flush_seconds = float(os.getenv("SHEETS_FLUSH_SECONDS", "30"))
+        self._pending_updates = []
+        self._failed = []   # Rangos que no se escribieron en flushes automáticos
+        self._last_flush = time.monotonic()
+        self._buffer_lock = threading.Lock()
+        # El transporte httplib2 no es thread-safe: serializamos las llamadas
+        self._http_lock = threading.Lock()
+
+    @property
+    def service(self):
+        """Cliente de Sheets compartido (src.auth); se construye en el primer uso"""
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    service = get_service('sheets', 'v4')
+                    if service is None:
+                        raise RuntimeError("No se pudo autenticar Google Sheets (revisa credentials.json)")
+                    self._service = service
+        return self._service
+
+    def _execute(self, request, op):
+        """
+        Ejecuta una petición respetando el rate limit de Sheets.
         
-        return creds
+        Args:
+            request: Petición de googleapiclient sin ejecutar
+            op: Nombre de la operación para las métricas (ej: 'values.get')
+        """
+        self.limiter.acquire()
+        with metrics.track("sheets", op) as call, self._http_lock:
+            try:
+                result = request.execute()
+            except HttpError as err:
+                self.limiter.report(err.resp.status)
+                raise
+            self.limiter.report(200)
+            body = getattr(request, 'body', None) or ""
+            call['bytes'] = len(body) + len(json.dumps(result, ensure_ascii=False))
+        return result
 
     def read_range(self, range_name):
         """
@@ -51,15 +99,38 @@ class SheetsInterface:
         """
         try:
             sheet = self.service.spreadsheets()
-            result = sheet.values().get(
+            result = self._execute(sheet.values().get(
                 spreadsheetId=self.spreadsheet_id,
                 range=range_name
-            ).execute()
+            ), 'values.get')
             return result.get('values', [])
         except HttpError as err:
             print(f"❌ Error leyendo {range_name}: {err}")
             return None
 
+    def read_ranges(self, range_names):
+        """
+        Lee varios rangos con un solo values.batchGet.
+        
+        Args:
+            range_names: Lista de rangos en formato 'Sheet!A1:B10'
+        
+        Returns:
+            Lista alineada con range_names (cada elemento es una lista de filas)
+            o None si falló
+        """
+        if not range_names:
+            return []
+        try:
+            result = self._execute(self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=range_names
+            ), 'values.batchGet')
+            return [vr.get('values', []) for vr in result.get('valueRanges', [])]
+        except HttpError as err:
+            print(f"❌ Error leyendo {len(range_names)} rangos: {err}")
+            return None
+
     def append_row(self, range_name, values):
         """
         Añade una fila al final del rango.
@@ -68,17 +139,50 @@ class SheetsInterface:
             range_name: Rango donde añadir (ej: 'Leads!A2')
             values: Lista con valores de la fila
         """
-        try:
-            body = {'values': [values]}
-            self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption="RAW",
-                insertDataOption="INSERT_ROWS",
-                body=body
-            ).execute()
-        except HttpError as err:
-            print(f"❌ Error añadiendo fila: {err}")
+        self.append_rows(range_name, [values])
+
+    def append_rows(self, range_name, rows, max_bytes=APPEND_MAX_BYTES):
+        """
+        Añade varias filas al final del rango en la menor cantidad de requests.
+        
+        Las filas se agrupan en requests de hasta max_bytes de payload JSON.
+        
+        Args:
+            range_name: Rango donde añadir (ej: 'Leads!A2')
+            rows: Lista de filas (cada fila es una lista de valores)
+            max_bytes: Tamaño máximo aproximado de cada request
+        
+        Returns:
+            Lista de rangos escritos (ej: ['Leads!A10:M34']), uno por request exitoso
+        """
+        written = []
+        for chunk in self._chunk_rows(rows, max_bytes):
+            try:
+                result = self._execute(self.service.spreadsheets().values().append(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=range_name,
+                    valueInputOption="RAW",
+                    insertDataOption="INSERT_ROWS",
+                    body={'values': chunk}
+                ), 'values.append')
+                written.append(result.get('updates', {}).get('updatedRange', ''))
+            except HttpError as err:
+                print(f"❌ Error añadiendo {len(chunk)} filas: {err}")
+        return written
+
+    @staticmethod
+    def _chunk_rows(rows, max_bytes):
+        """Agrupa filas consecutivas sin pasar max_bytes de JSON por grupo"""
+        chunk, size = [], 0
+        for row in rows:
+            row_size = len(json.dumps(row, ensure_ascii=False).encode())
+            if chunk and size + row_size > max_bytes:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(row)
+            size += row_size
+        if chunk:
+            yield chunk
 
     def update_range(self, range_name, values):
         """
@@ -90,15 +194,105 @@ class SheetsInterface:
         """
         try:
             body = {'values': values}
-            self.service.spreadsheets().values().update(
+            self._execute(self.service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range=range_name,
                 valueInputOption="RAW",
                 body=body
-            ).execute()
+            ), 'values.update')
         except HttpError as err:
             print(f"❌ Error actualizando {range_name}: {err}")
 
+    def buffer_update(self, range_name, values):
+        """
+        Encola una actualización; se envía en el próximo flush.
+        
+        Hace flush automático al llegar a SHEETS_FLUSH_ROWS rangos
+        o tras SHEETS_FLUSH_SECONDS desde el último envío.
+        
+        Args:
+            range_name: Rango a actualizar (ej: 'Leads!G2:L2')
+            values: Lista de filas con valores
+        """
+        with self._buffer_lock:
+            self._pending_updates.append({'range': range_name, 'values': values})
+            should_flush = (
+                len(self._pending_updates) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_seconds
+            )
+        
+        if should_flush:
+            # Los rangos fallidos quedan guardados hasta el flush final
+            failed = self._flush_pending()
+            with self._buffer_lock:
+                self._failed.extend(failed)
+
+    def flush(self, max_attempts=3):
+        """
+        Envía todas las actualizaciones pendientes en un solo batchUpdate.
+        
+        Si algo falla se reintentan solo los rangos que no se escribieron.
+        
+        Returns:
+            Lista de rangos que no se pudieron escribir, incluidos los de
+            flushes automáticos anteriores (se entregan una sola vez)
+        """
+        failed = self._flush_pending(max_attempts)
+        with self._buffer_lock:
+            failed, self._failed = self._failed + failed, []
+        return failed
+
+    def _flush_pending(self, max_attempts=3):
+        """
+        Un flush del buffer actual con reintentos.
+        
+        Returns:
+            Rangos de este flush que no se pudieron escribir
+        """
+        with self._buffer_lock:
+            pending, self._pending_updates = self._pending_updates, []
+            self._last_flush = time.monotonic()
+        
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(2 ** attempt)
+                print(f"   🔁 Reintentando {len(pending)} rangos...")
+            pending = self._batch_update(pending)
+        
+        for item in pending:
+            print(f"❌ No se pudo escribir {item['range']}")
+        return [item['range'] for item in pending]
+
+    def _batch_update(self, data):
+        """
+        Un intento de values.batchUpdate.
+        
+        Returns:
+            Sublista de data que no quedó escrita
+        """
+        try:
+            result = self._execute(self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'valueInputOption': "RAW", 'data': data}
+            ), 'values.batchUpdate')
+        except HttpError as err:
+            status = getattr(err.resp, 'status', None)
+            if status in (429, 500, 502, 503, 504) or len(data) == 1:
+                print(f"⚠️ Error en batchUpdate ({len(data)} rangos): {err}")
+                return data
+            # Un rango inválido tumba todo el request: dividimos para aislarlo
+            mid = len(data) // 2
+            return self._batch_update(data[:mid]) + self._batch_update(data[mid:])
+        
+        # Las respuestas vienen en el mismo orden que los rangos enviados
+        responses = result.get('responses', [])
+        return [
+            item for i, item in enumerate(data)
+            if i >= len(responses) or not responses[i].get('updatedRange')
+        ]
+
     def update_cell(self, cell, value):
         """
         Actualiza una celda individual.
@@ -117,19 +311,19 @@ class SheetsInterface:
             range_name: Rango a limpiar
         """
         try:
-            self.service.spreadsheets().values().clear(
+            self._execute(self.service.spreadsheets().values().clear(
                 spreadsheetId=self.spreadsheet_id,
                 range=range_name
-            ).execute()
+            ), 'values.clear')
         except HttpError as err:
             print(f"❌ Error limpiando {range_name}: {err}")
 
     def get_sheet_names(self):
         """Obtiene nombres de todas las pestañas"""
         try:
-            sheet_metadata = self.service.spreadsheets().get(
+            sheet_metadata = self._execute(self.service.spreadsheets().get(
                 spreadsheetId=self.spreadsheet_id
-            ).execute()
+            ), 'spreadsheets.get')
             
             sheets = sheet_metadata.get('sheets', [])
             return [s.get('properties', {}).get('title', '') for s in sheets]
@@ -0,0 +1,141 @@
+"""
+Snapshots de páginas de Sales Navigator y reproducción sin navegador
+Cada página visitada se guarda (HTML + tarjetas extraídas) como una línea
+JSON en un archivo .jsonl.gz; el modo replay la vuelve a pasar por
+card_parser para probar y medir la extracción en local.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from src.card_parser import normalize_inner_text, parse_cards_html
+
+SNAPSHOT_DIR = "./data/snapshots"
+
+
+def new_snapshot_path():
+    """Ruta para el archivo de snapshots de una corrida nueva"""
+    return os.path.join(SNAPSHOT_DIR, f"snap-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+
+
+class SnapshotWriter:
+    """Agrega páginas a un archivo .jsonl.gz (una línea por página)"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.pages = 0
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, "at", encoding="utf-8")
+
+    def write(self, url, page_num, html, cards):
+        record = {
+            "url": url,
+            "page": page_num,
+            "captured_at": datetime.now().isoformat(timespec="seconds"),
+            "html": html,
+            "cards": cards,
+        }
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+            self.pages += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_snapshots(path):
+    """
+    Lee un archivo de snapshots página por página.
+
+    Yields: Dict {url, page, captured_at, html, cards}
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplayScraper:
+    """
+    Reemplazo de MeridianScraper que reproduce un archivo de snapshots.
+
+    Misma interfaz (iter_pages / get_profiles) y mismo parser que el resto
+    del código offline; sin login ni esperas anti-ban.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def iter_pages(self, search_url=None, max_pages=None):
+        for page_num, record in enumerate(iter_snapshots(self.path), start=1):
+            if max_pages and page_num > max_pages:
+                break
+            print(f"\n🎞️ Página {page_num} (replay)")
+            yield parse_cards_html(record["html"])
+
+    def get_profiles(self, search_url=None, max_pages=None):
+        all_results = [card for page in self.iter_pages(search_url, max_pages) for card in page]
+        print(f"\n✅ Total perfiles extraídos: {len(all_results)}")
+        return all_results
+
+
+def _card_key(card):
+    """Lo que debe coincidir entre la extracción en vivo y el replay"""
+    fields = {field: " ".join(value.split()) for field, value in (card.get("fields") or {}).items()}
+    return (normalize_inner_text(card.get("text", "")), card.get("url", ""), fields)
+
+
+def replay(path, repeat=1, workers=None):
+    """
+    Pasa todas las páginas del archivo por card_parser y compara con las
+    tarjetas extraídas en vivo.
+
+    Args:
+        path: Archivo .jsonl.gz
+        repeat: Vueltas sobre el archivo (para medir con más páginas)
+        workers: Procesos para parsear (default: un proceso por CPU)
+
+    Returns:
+        Dict con páginas, tarjetas, páginas/seg y páginas que no coinciden
+    """
+    records = list(iter_snapshots(path))
+
+    htmls = [record["html"] for record in records] * max(1, repeat)
+    workers = workers or os.cpu_count() or 1
+
+    # El parser es CPU puro: con varias CPUs, un proceso por CPU
+    started = time.perf_counter()
+    if workers > 1 and len(htmls) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse_cards_html, htmls, chunksize=max(1, len(htmls) // (workers * 4))))
+    else:
+        parsed = [parse_cards_html(html) for html in htmls]
+    elapsed = time.perf_counter() - started
+    parsed = parsed[:len(records)]
+
+    mismatches = [
+        record["page"] for record, cards in zip(records, parsed)
+        if [_card_key(c) for c in cards] != [_card_key(c) for c in record["cards"]]
+    ]
+    pages = len(records) * max(1, repeat)
+    return {
+        "pages": pages,
+        "cards": sum(len(cards) for cards in parsed),   # Por vuelta
+        "seconds": round(elapsed, 4),
+        "pages_per_second": round(pages / elapsed, 1) if elapsed else None,
+        "mismatched_pages": mismatches,
+    }
@@ -0,0 +1,60 @@
+"""
+Perfil de arranque de main.py
+Re-ejecuta un subcomando con `python -X importtime` y resume cuánto
+tiempo de import se fue en cada paquete.
+"""
+
+import subprocess
+import sys
+import time
+
+PROFILE_FLAG = "--profile-startup"
+
+
+def _parse_importtime(stderr):
+    """
+    Suma el tiempo propio (self) de cada módulo bajo su paquete de primer nivel.
+
+    Returns:
+        Tuple: ({paquete: microsegundos}, líneas de stderr que no son del perfil)
+    """
+    totals = {}
+    other = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # Encabezado
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return totals, other
+
+
+def profile_startup(argv, top=15):
+    """
+    Corre el comando (sin el flag) en un proceso hijo e imprime el desglose.
+
+    Args:
+        argv: sys.argv original (ej: ['main.py', 'status', '--profile-startup'])
+        top: Paquetes a mostrar
+
+    Returns:
+        Código de salida del comando
+    """
+    args = [arg for arg in argv if arg != PROFILE_FLAG]
+
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+
+    totals, other = _parse_importtime(proc.stderr)
+    for line in other:
+        print(line, file=sys.stderr)
+
+    total_imports = sum(totals.values()) / 1e6
+    print(f"\n⏱️ Arranque de '{' '.join(args[1:]) or 'main.py'}': {elapsed:.2f}s en total, {total_imports:.2f}s en imports")
+    for package, us in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"   {package:<28} {us / 1000:8.1f} ms")
+    return proc.returncode
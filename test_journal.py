@@ -0,0 +1,37 @@
+"""
+Journal de corrida: al cerrar, las tarjetas sin guardar pasan a la
+siguiente corrida y los pasos ya resueltos no se reutilizan.
+Corre con: python -m pytest test_journal.py
+"""
+
+from src.journal import RunJournal
+
+
+def test_complete_defers_unsaved_cards_and_drops_other_steps(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.sqlite"))
+    journal.begin()
+
+    # 3 tarjetas scrapeadas; el cupo diario dejó guardar solo la primera
+    for key in ("a", "b", "c"):
+        journal.record('card', key, {'url': key, 'text': key})
+    journal.record('saved', 'a')
+    journal.record('research', 'acme', ["info", []])
+    journal.record('evaluate', 'lead-1', {'score': 80})
+    journal.record('extract', 'a', {'name': "Ana"})
+
+    assert journal.complete() == 2
+    assert journal.run_id is None
+
+    # La corrida siguiente es nueva (no se retoma) y arranca con las diferidas
+    assert journal.begin() is False
+    assert [card['url'] for card in journal.pending('card', 'saved')] == ["b", "c"]
+    assert journal.get('research', 'acme') is None
+    assert journal.get('evaluate', 'lead-1') is None
+    assert journal.get('extract', 'a') is None
+
+    # Una vez guardadas, no vuelven a diferirse
+    journal.record('saved', 'b')
+    journal.record('saved', 'c')
+    assert journal.complete() == 0
+    journal.begin()
+    assert journal.pending('card', 'saved') == []
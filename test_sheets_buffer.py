@@ -0,0 +1,78 @@
+"""
+Buffer de escrituras de SheetsInterface: los rangos que fallan en un
+flush automático deben aparecer en el flush final.
+Corre con: python -m pytest test_sheets_buffer.py
+"""
+
+import json
+
+from googleapiclient.errors import HttpError
+
+import src.sheets
+from src.sheets import SheetsInterface
+
+
+class _Response(dict):
+
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "Backend Error"
+
+
+class _Request:
+
+    def __init__(self, action):
+        self.action = action
+
+    def execute(self):
+        return self.action()
+
+
+class _Values:
+    """values.batchUpdate que responde 503 las primeras 'failures' veces"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.written = []
+
+    def batchUpdate(self, spreadsheetId, body):
+        def action():
+            if self.failures:
+                self.failures -= 1
+                raise HttpError(_Response(503), json.dumps({"error": {"message": "Backend Error"}}).encode())
+            self.written.extend(item['range'] for item in body['data'])
+            return {'responses': [{'updatedRange': item['range']} for item in body['data']]}
+        return _Request(action)
+
+
+class _Service:
+
+    def __init__(self, values):
+        self._values = values
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self._values
+
+
+def test_flush_reports_ranges_failed_in_automatic_flush(monkeypatch):
+    monkeypatch.setenv("SHEETS_FLUSH_ROWS", "2")
+    monkeypatch.setenv("SHEETS_RATE_PER_MIN", "6000000")   # Sin esperas del rate limiter
+    monkeypatch.setenv("QUOTA_DB_PATH", ":memory:")
+    monkeypatch.setattr(src.sheets.time, "sleep", lambda seconds: None)
+
+    # El flush automático agota sus 3 intentos con 503
+    values = _Values(failures=3)
+    sheets = SheetsInterface("test", service=_Service(values))
+
+    sheets.buffer_update("Leads!G2:L2", [["a"]])
+    sheets.buffer_update("Leads!G3:L3", [["b"]])   # Flush automático (falla)
+    sheets.buffer_update("Leads!G4:L4", [["c"]])
+
+    assert sheets.flush() == ["Leads!G2:L2", "Leads!G3:L3"]
+    assert values.written == ["Leads!G4:L4"]
+    # Las fallas se entregan una sola vez
+    assert sheets.flush() == []